@@ -293,12 +293,14 @@ function search(state, next) {
         bookmarks: state.bookmarks && state.user,
         navigation: getNavigationUrlParam(searchParams.navigation, true, false),
         filter: !isEmpty(searchParams.filter) && encodeURIComponent(JSON.stringify(searchParams.filter)),
-        from: next ? state.items.length : 0,
+        from: next && !state.nextToken ? state.items.length : 0,
         date_from: fromDateFilter,
         date_to: dateTo,
         timezone_offset: getTimezoneOffset(),
         featured: featuredFilter,
         eventsOnlyView: eventsOnlyFilter,
+        cursor: 1,
+        next: next && state.nextToken,
     };
 
     const queryString = Object.keys(params)
@@ -573,11 +575,12 @@ export function recieveNextItems(data) {
     return {type: RECIEVE_NEXT_ITEMS, data};
 }
 
-const MAX_ITEMS = 1000; // server limit
+const MAX_ITEMS = 1000; // server limit for pagination using from
 export function fetchMoreItems() {
     return (dispatch, getState) => {
         const state = getState();
-        const limit = Math.min(MAX_ITEMS, state.totalItems);
+        // next page token from previous response has no limit
+        const limit = state.nextToken ? state.totalItems : Math.min(MAX_ITEMS, state.totalItems);
 
         if (state.isLoading || state.items.length >= limit) {
             return Promise.reject();
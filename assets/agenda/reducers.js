@@ -33,6 +33,7 @@ const initialState = {
     isLoading: false,
     resultsFiltered: false,
     totalItems: null,
+    nextToken: null,
     activeQuery: null,
     user: null,
     company: null,
@@ -121,6 +122,7 @@ function recieveItems(state, data) {
         itemsById,
         isLoading: false,
         totalItems: data._meta.total,
+        nextToken: data._next || null,
         aggregations: processAggregations(data._aggregations) || null,
         newItems: [],
         agenda,
@@ -60,7 +60,12 @@ function getReportQueryString(currentState, next, exportReport, notify) {
             params.export = true;
         }
 
-        params['from'] = next ? get(currentState, 'results.length') : 0;
+        if (next && currentState.nextToken) {
+            params.next = currentState.nextToken;
+        } else {
+            params['from'] = next ? get(currentState, 'results.length') : 0;
+        }
+
         const queryString = Object.keys(params)
             .filter((key) => params[key])
             .map((key) => [key, params[key]].join('='))
@@ -93,8 +98,8 @@ export function receivedData(data) {
 }
 
 export const ADD_RESULTS = 'ADD_RESULTS';
-export function addResults(results) {
-    return {type: ADD_RESULTS, data: results};
+export function addResults(results, nextToken) {
+    return {type: ADD_RESULTS, data: results, nextToken};
 }
 
 export const SET_ERROR = 'SET_ERROR';
@@ -167,7 +172,7 @@ export function fetchReport(url, next, exportReport) {
                 dispatch(receivedData(data));
             } else {
                 dispatch(isLoading(false));
-                dispatch(addResults(get(data, 'results', [])));
+                dispatch(addResults(get(data, 'results', []), get(data, '_next')));
             }
         })
             .catch((error) => errorHandler(error, dispatch, setError));
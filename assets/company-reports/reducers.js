@@ -17,6 +17,7 @@ const initialState = {
     isLoading: false,
     activeReport: null,
     results: [],
+    nextToken: null,
     resultHeaders: [],
     aggregations: null,
     companies: [],
@@ -50,6 +51,7 @@ export default function companyReportReducer(state = initialState, action) {
         return {
             ...state,
             results: [],
+            nextToken: null,
             isLoading: true,
         };
     }
@@ -59,6 +61,7 @@ export default function companyReportReducer(state = initialState, action) {
             ...state,
             activeReport: action.data,
             results: [],
+            nextToken: null,
         };
     }
 
@@ -66,6 +69,7 @@ export default function companyReportReducer(state = initialState, action) {
         return {
             ...state,
             results: get(action, 'data.results'),
+            nextToken: get(action, 'data._next') || null,
             isLoading: false,
             aggregations: get(action, 'data.aggregations', null),
             resultHeaders: get(action, 'data.result_headers', []),
@@ -87,7 +91,8 @@ export default function companyReportReducer(state = initialState, action) {
     case ADD_RESULTS:
         return {
             ...state,
-            results: [ ...state.results, ...action.data ]
+            results: [ ...state.results, ...action.data ],
+            nextToken: action.nextToken || null,
         };
 
     case SET_IS_LOADING:
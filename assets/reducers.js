@@ -169,6 +169,7 @@ export function defaultReducer(state={}, action) {
             searchInitiated: true,
             isLoading: true,
             totalItems: null,
+            nextToken: null,
             activeQuery: state.query,
             resultsFiltered,
         };
@@ -188,7 +189,13 @@ export function defaultReducer(state={}, action) {
             }
             return item._id;
         });
-        return {...state, items: uniq([...state.items, ...newItems]), itemsById, isLoading: false};
+        return {
+            ...state,
+            items: uniq([...state.items, ...newItems]),
+            itemsById,
+            isLoading: false,
+            nextToken: action.data._next || null,
+        };
     }
 
     case SET_STATE:
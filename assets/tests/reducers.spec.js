@@ -82,5 +82,18 @@ describe('default reducer', () => {
             expect(result.itemsById.bar1).toEqual({_id: 'bar1'});
             expect(result.itemsById.bar2).toEqual({_id: 'bar2'});
         });
+
+        it('stores next page token', () => {
+            initialState.nextToken = 'foo';
+            const result = defaultReducer(initialState, {
+                type: 'RECIEVE_NEXT_ITEMS',
+                data: {
+                    _items: [{_id: 'foo'}],
+                    _next: 'bar',
+                }
+            });
+
+            expect(result.nextToken).toBe('bar');
+        });
     });
 });
@@ -19,6 +19,7 @@ const initialState = {
     openItem: null,
     isLoading: false,
     totalItems: null,
+    nextToken: null,
     activeQuery: null,
     user: null,
     userType: null,
@@ -54,6 +55,7 @@ function recieveItems(state, data) {
         itemsById,
         isLoading: false,
         totalItems: data._meta.total,
+        nextToken: data._next || null,
         aggregations: data._aggregations || null,
         newItems: [],
         searchInitiated: false,
@@ -25,8 +25,8 @@ describe('wire actions', () => {
 
     beforeEach(() => {
         spyOn(utils.now, 'utcOffset').and.returnValue('');
-        fetchMock.get('begin:/wire/search?&tick=', response);
-        fetchMock.get('begin:/wire/search?q=foo&es_highlight=1&tick=', response);
+        fetchMock.get('begin:/wire/search?cursor=1&tick=', response);
+        fetchMock.get('begin:/wire/search?q=foo&es_highlight=1&cursor=1&tick=', response);
         store = createStore(wireApp, applyMiddleware(thunk));
     });
 
@@ -172,7 +172,7 @@ describe('wire actions', () => {
     });
 
     it('can fetch more items', (done) => {
-        fetchMock.get('begin:/wire/search?from=1&tick=', {_items: [{_id: 'bar'}]});
+        fetchMock.get('begin:/wire/search?from=1&cursor=1&tick=', {_items: [{_id: 'bar'}]});
         return store.dispatch(actions.fetchItems())
             .then(() => {
                 expect(store.getState().totalItems).toBe(2);
@@ -191,6 +191,21 @@ describe('wire actions', () => {
             });
     });
 
+    it('can fetch more items using next page token', () => {
+        fetchMock.restore();
+        fetchMock.get('begin:/wire/search?cursor=1&tick=', {...response, _next: 'token1'});
+        fetchMock.get('begin:/wire/search?cursor=1&next=token1&tick=', {_items: [{_id: 'bar'}]});
+        return store.dispatch(actions.fetchItems())
+            .then(() => {
+                expect(store.getState().nextToken).toBe('token1');
+                return store.dispatch(actions.fetchMoreItems());
+            })
+            .then(() => {
+                expect(store.getState().items).toEqual(['foo', 'bar']);
+                expect(store.getState().nextToken).toBeNull();
+            });
+    });
+
     it('can set and reset service filter', () => {
         store.dispatch(toggleNavigation({_id: 'foo'}));
         expect(store.getState().search.activeNavigation).toEqual(['foo']);
@@ -1,8 +1,12 @@
 #!/usr/bin/env python
 
+import time
+
+from datetime import timedelta
 from flask_script import Manager
 
 from superdesk import get_resource_service
+from superdesk.utc import utcnow
 
 from newsroom.web import NewsroomWebApp
 from newsroom.elastic_utils import rebuild_elastic_index
@@ -11,6 +15,8 @@ from newsroom.auth import get_user_by_email
 from newsroom.company_expiry_alerts import CompanyExpiryAlerts
 from newsroom.monitoring .email_alerts import MonitoringEmailAlerts
 from newsroom.data_updates import GenerateUpdate, Upgrade, get_data_updates_files, Downgrade
+from newsroom.topics import percolator as topics_percolator
+from newsroom.formatter import format_items
 
 import content_api
 
@@ -96,6 +102,23 @@ def remove_expired(expiry_days):
     exp.run(expiry_days)
 
 
+@manager.command
+def topics_percolator_rebuild():
+    count = topics_percolator.rebuild()
+    print('stored {} topics in percolator'.format(count))
+
+
+@manager.option('-h', '--hours', dest='hours', default=24)
+def topics_percolator_check(hours):
+    since = utcnow() - timedelta(hours=int(hours))
+    items = get_resource_service('items').find({'versioncreated': {'$gte': since}, 'nextversion': {'$exists': False}})
+    item_ids = [item['_id'] for item in items]
+    differences = topics_percolator.check_consistency(item_ids)
+    for item_id, missing, extra in differences:
+        print('item {} missing topics {} extra topics {}'.format(item_id, list(missing), list(extra)))
+    print('checked {} items, {} with differences'.format(len(item_ids), len(differences)))
+
+
 @manager.option('-r', '--resource', dest='resource', required=True)
 def data_generate_update(resource):
     cmd = GenerateUpdate()
@@ -142,5 +165,26 @@ def data_downgrade(data_update_id=None, fake=False, dry=False):
     cmd.run(data_update_id, fake, dry)
 
 
+@manager.option('-f', '--format', dest='_format', default='newsmlg2')
+@manager.option('-p', '--pool-size', dest='pool_size', default=4)
+@manager.option('-s', '--sizes', dest='sizes', default='10,50,200')
+def benchmark_download_formatting(_format, pool_size, sizes):
+    """Compare serial and parallel formatting of latest items used for multi-item downloads."""
+    formatter = app.download_formatters[_format]['formatter']
+    sizes = [int(size) for size in sizes.split(',')]
+    items = list(get_resource_service('items').find({'nextversion': {'$exists': False}})
+                 .sort('versioncreated', -1).limit(max(sizes)))
+    app.config['FORMATTER_CACHE_TIMEOUT'] = 0  # measure formatting, not cache
+    for size in sizes:
+        batch = items[:size]
+        timings = []
+        for batch_pool_size in (0, int(pool_size)):
+            start = time.time()
+            formatted = list(format_items(formatter, batch, pool_size=batch_pool_size))
+            timings.append(time.time() - start)
+        print('{} items ({} formatted): serial {:.3f}s, {} threads {:.3f}s'.format(
+            len(batch), len(formatted), timings[0], pool_size, timings[1]))
+
+
 if __name__ == "__main__":
     manager.run()
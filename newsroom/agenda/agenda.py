@@ -14,6 +14,7 @@ from superdesk.utils import ListCursor
 
 import newsroom
 from newsroom.agenda.email import send_coverage_notification_email, send_agenda_notification_email
+from newsroom.email import bulk_emails
 from newsroom.auth import get_user
 from newsroom.companies import get_user_company
 from newsroom.notifications import push_notification
@@ -22,7 +23,7 @@ from newsroom.utils import get_user_dict, get_company_dict, get_entity_or_404, p
 from newsroom.utils import get_local_date, get_end_date
 from datetime import datetime
 from newsroom.wire import url_for_wire
-from newsroom.search import BaseSearchService, SearchQuery, query_string
+from newsroom.search import BaseSearchService, SearchQuery, query_string, use_filter_context
 from .utils import get_latest_available_delivery, TO_BE_CONFIRMED_FIELD
 from bson import ObjectId
 
@@ -682,11 +683,15 @@ class AgendaService(BaseSearchService):
 
         # Append the product query to the agenda query
         agenda_query = _agenda_query()
-        agenda_query['bool']['must'].append(search.query)
+        if use_filter_context():
+            agenda_query['bool']['filter'] = [search.query]
+        else:
+            agenda_query['bool']['must'].append(search.query)
         search.query = agenda_query
 
         # Apply agenda based filters
-        self.apply_section_filter(search)
+        with self.permissions_filter(search):
+            self.apply_section_filter(search)
         self.apply_request_filter(search)
 
         if not is_admin_or_internal(search.user):
@@ -780,7 +785,7 @@ class AgendaService(BaseSearchService):
 
         set_post_filter(search.source, search, search.is_events_only)
 
-        if not search.source['from'] and not search.args.get('bookmarks'):
+        if not search.source['from'] and not search.args.get('next') and not search.args.get('bookmarks'):
             # avoid aggregations when handling pagination
             search.source['aggs'] = get_agenda_aggregations(search.is_events_only)
         else:
@@ -979,9 +984,10 @@ class AgendaService(BaseSearchService):
         user_dict = get_user_dict()
         company_dict = get_company_dict()
         notify_user_ids = filter_active_users(agenda.get('watches', []), user_dict, company_dict, events_only=True)
-        for user_id in notify_user_ids:
-            user = user_dict[str(user_id)]
-            send_coverage_notification_email(user, agenda, wire_item)
+        with bulk_emails():
+            for user_id in notify_user_ids:
+                user = user_dict[str(user_id)]
+                send_coverage_notification_email(user, agenda, wire_item)
 
     def notify_agenda_update(self, update_agenda, original_agenda, item=None, events_only=False,
                              related_planning_removed=None, coverage_updated=None):
@@ -1142,23 +1148,24 @@ class AgendaService(BaseSearchService):
                         users = users + [user_dict[str(user_id)] for user_id in notify_user_ids]
 
                 # Send notifications to users
-                for user in users:
-                    app.data.insert('notifications', [{
-                        'item': agenda.get('_id'),
-                        'user': user['_id']
-                    }])
-
-                    send_agenda_notification_email(
-                        user,
-                        agenda,
-                        message,
-                        subject,
-                        original_agenda,
-                        coverage_updates,
-                        related_planning_removed,
-                        coverage_updated,
-                        time_updated,
-                    )
+                with bulk_emails():
+                    for user in users:
+                        app.data.insert('notifications', [{
+                            'item': agenda.get('_id'),
+                            'user': user['_id']
+                        }])
+
+                        send_agenda_notification_email(
+                            user,
+                            agenda,
+                            message,
+                            subject,
+                            original_agenda,
+                            coverage_updates,
+                            related_planning_removed,
+                            coverage_updated,
+                            time_updated,
+                        )
 
     def get_saved_items_count(self):
         search = SearchQuery()
@@ -1,6 +1,9 @@
 
 import newsroom
 from content_api import MONGO_PREFIX
+from newsroom.topics.percolator import queue_topics_update
+from newsroom.utils import bump_directory_version
+from newsroom.products.products import bump_products_version
 
 
 class CompaniesResource(newsroom.Resource):
@@ -79,4 +82,17 @@ class CompaniesResource(newsroom.Resource):
 
 
 class CompaniesService(newsroom.Service):
-    pass
+    def on_created(self, docs):
+        super().on_created(docs)
+        bump_directory_version()
+
+    def on_updated(self, updates, original):
+        super().on_updated(updates, original)
+        queue_topics_update(company_ids=[original['_id']])
+        bump_directory_version()
+
+    def on_deleted(self, doc):
+        super().on_deleted(doc)
+        queue_topics_update(company_ids=[doc['_id']])
+        bump_directory_version()
+        bump_products_version()
@@ -10,6 +10,8 @@ from werkzeug.exceptions import NotFound
 
 from newsroom.decorator import admin_only, account_manager_only, login_required
 from newsroom.companies import blueprint
+from newsroom.products.products import bump_products_version
+from newsroom.topics.percolator import queue_topics_update
 from newsroom.utils import query_resource, find_one, get_entity_or_404, get_json_or_400, set_original_creator, \
     set_version_creator, is_safe_string, PHONE_REGEX, clean_product, clean_company, clean_user
 from wtforms.validators import Email, URL, Regexp, ValidationError
@@ -187,6 +189,8 @@ def update_products(updates, company_id):
             db.update_one({'_id': product['_id']}, {'$addToSet': {'companies': company_id}})
         else:
             db.update_one({'_id': product['_id']}, {'$pull': {'companies': company_id}})
+    bump_products_version()
+    queue_topics_update(company_ids=[company_id])
 
 
 def update_company(data, _id):
@@ -163,6 +163,8 @@ VALIDATE_ACCOUNT_TOKEN_TIME_TO_LIVE = 7
 MAXIMUM_FAILED_LOGIN_ATTEMPTS = 5
 #: default sender for superdesk emails
 MAIL_DEFAULT_SENDER = _MAIL_FROM or 'newsroom@localhost'
+#: Number of emails sent using single smtp connection when sending emails in bulk
+MAIL_BULK_CHUNK_SIZE = 100
 # Recipients for the sign up form filled by new users (single or comma separated)
 SIGNUP_EMAIL_RECIPIENTS = os.environ.get('SIGNUP_EMAIL_RECIPIENTS')
 
@@ -182,6 +184,11 @@ CACHE_DEFAULT_TIMEOUT = 3600
 # Redis host (used only if CACHE_TYPE is redis)
 CACHE_REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379')
 
+#: Max age of data cached in process by :func:`newsroom.utils.get_versioned_cache` (in seconds),
+#: it's reloaded after that even if its version was not bumped, so processes which don't share
+#: the cache (eg. with ``simple`` cache type) get the changes made in other processes
+VERSIONED_CACHE_MAX_AGE = int(env('VERSIONED_CACHE_MAX_AGE', 60))
+
 # Recaptcha Settings
 RECAPTCHA_PUBLIC_KEY = os.environ.get('RECAPTCHA_PUBLIC_KEY')
 RECAPTCHA_PRIVATE_KEY = os.environ.get('RECAPTCHA_PRIVATE_KEY')
@@ -205,6 +212,56 @@ PERMANENT_SESSION_LIFETIME = 604800  # 7 days
 # the time to live value in days for user notifications
 NOTIFICATIONS_TTL = 1
 
+#: Send new item notifications from celery worker instead of push request
+NOTIFY_NEW_ITEM_ASYNC = strtobool(env('NOTIFY_NEW_ITEM_ASYNC', 'false'))
+#: How long (in seconds) to remember that notifications for item version were sent
+NOTIFY_NEW_ITEM_DONE_TTL = 3600
+
+#: Match wire topics using elasticsearch percolator,
+#: run ``python manage.py topics_percolator_rebuild`` before enabling it
+WIRE_TOPICS_PERCOLATOR = strtobool(env('WIRE_TOPICS_PERCOLATOR', 'false'))
+
+#: Generate picture renditions in celery worker instead of push request,
+#: until those are generated the ui is using source renditions
+RENDITIONS_ASYNC = strtobool(env('RENDITIONS_ASYNC', 'false'))
+
+#: How to write history records:
+#: ``sync`` - write in request, ``buffer`` - collect in process and write in batches,
+#: ``celery`` - write in celery worker
+HISTORY_WRITE_MODE = env('HISTORY_WRITE_MODE', 'sync')
+#: Write buffered history records when there are at least this many
+HISTORY_BUFFER_SIZE = 500
+#: Write buffered history records when the oldest is older than this (in seconds)
+HISTORY_BUFFER_TIMEOUT = 10
+
+#: Put permission clauses (section filters, company type, time limit and products)
+#: into bool filter context so these are not scored and elastic can cache them
+SEARCH_FILTER_CONTEXT = strtobool(env('SEARCH_FILTER_CONTEXT', 'false'))
+
+#: Cache search aggregations for the same query and filters (in seconds),
+#: cache is invalidated when new items are pushed, so with multiple processes
+#: it requires a shared cache (eg. redis) - disabled by default
+SEARCH_AGGREGATIONS_CACHE_TIMEOUT = int(env('SEARCH_AGGREGATIONS_CACHE_TIMEOUT', 0))
+
+#: Share results of identical searches running at the same time in a process
+SEARCH_COALESCING = strtobool(env('SEARCH_COALESCING', 'false'))
+#: How long (in seconds) to wait for identical running search before sending own request
+SEARCH_COALESCING_TIMEOUT = 30
+
+#: Log searches slower than this (in seconds) with timings and generated query
+SEARCH_SLOW_QUERY_TIME = 2
+
+#: Cache formatted items (in seconds), disabled by default. Enable it only with a shared cache
+#: with memory limit and eviction (eg. redis with ``maxmemory``), the default ``simple`` cache
+#: would keep up to ``FORMATTER_CACHE_MAX_SIZE`` per item and format in every process
+FORMATTER_CACHE_TIMEOUT = int(env('FORMATTER_CACHE_TIMEOUT', 0))
+#: Don't cache formatted items bigger than this (in bytes)
+FORMATTER_CACHE_MAX_SIZE = 1024 * 1024
+
+#: Number of threads formatting items for multi-item downloads, ``0`` formats items one by one
+#: (use ``manage.py benchmark_download_formatting`` to compare)
+DOWNLOAD_FORMATTER_POOL_SIZE = int(env('DOWNLOAD_FORMATTER_POOL_SIZE', 0))
+
 SERVICES = [
     {"name": "Domestic Sport", "code": "t"},
     {"name": "Overseas Sport", "code": "s"},
@@ -1,19 +1,27 @@
+from contextlib import contextmanager
 from superdesk.emails import SuperdeskMessage  # it handles some encoding issues
-from flask import current_app, render_template, url_for
-from flask_babel import gettext
+from flask import current_app, render_template, url_for, g
+from flask_babel import gettext, get_locale
+from markupsafe import escape
 from newsroom.celery_app import celery
 from flask_mail import Attachment
 
 from newsroom.utils import get_agenda_dates, get_location_string, get_links, \
     get_public_contacts
 from newsroom.template_filters import is_admin_or_internal
+from newsroom.formatter import format_item_cached
 from newsroom.utils import url_for_agenda
 from superdesk.logging import logger
 import base64
 
+USER_NAME_PLACEHOLDER = '__newsroom_user_name__'
+TOPIC_NAME_PLACEHOLDER = '__newsroom_topic_name__'
 
-@celery.task(bind=True, soft_time_limit=120)
-def _send_email(self, to, subject, text_body, html_body=None, sender=None, attachments_info=None):
+#: notification templates rendering stats for this process
+render_stats = {'hits': 0, 'misses': 0}
+
+
+def get_message(to, subject, text_body, html_body=None, sender=None, attachments_info=None):
     if attachments_info is None:
         attachments_info = []
 
@@ -33,6 +41,12 @@ def _send_email(self, to, subject, text_body, html_body=None, sender=None, attac
     msg = SuperdeskMessage(subject=subject, sender=sender, recipients=to, attachments=decoded_attachments)
     msg.body = text_body
     msg.html = html_body
+    return msg
+
+
+@celery.task(bind=True, soft_time_limit=120)
+def _send_email(self, to, subject, text_body, html_body=None, sender=None, attachments_info=None):
+    msg = get_message(to, subject, text_body, html_body, sender, attachments_info)
     app = current_app._get_current_object()
     with app.mail.connect() as connection:
         if connection:
@@ -41,6 +55,31 @@ def _send_email(self, to, subject, text_body, html_body=None, sender=None, attac
         return app.mail.send(msg)
 
 
+@celery.task(bind=True, soft_time_limit=600)
+def _send_emails(self, messages):
+    """Send multiple emails using single smtp connection.
+
+    :param messages: list of :func:`send_email` kwargs
+    :return: list of errors with recipients
+    """
+    errors = []
+    processed = 0
+    app = current_app._get_current_object()
+    try:
+        with app.mail.connect() as connection:
+            for message in messages:
+                try:
+                    connection.send(get_message(**message))
+                except Exception as e:
+                    logger.error('Error sending mail. Receipient(s): {}. Error: {}'.format(message['to'], e))
+                    errors.append({'to': message['to'], 'error': str(e)})
+                processed += 1
+    except Exception as e:
+        logger.error('Error sending mails. Error: {}'.format(e))
+        errors.extend({'to': message['to'], 'error': str(e)} for message in messages[processed:])
+    return errors
+
+
 def send_email(to, subject, text_body, html_body=None, sender=None, attachments_info=[]):
     """
     Sends the email
@@ -59,9 +98,37 @@ def send_email(to, subject, text_body, html_body=None, sender=None, attachments_
         'sender': sender,
         'attachments_info': attachments_info,
     }
+    if g.get('bulk_emails') is not None:
+        g.bulk_emails.append(kwargs)
+        return
     _send_email.apply_async(kwargs=kwargs)
 
 
+@contextmanager
+def bulk_emails():
+    """Collect emails sent within the block and send them in bulk.
+
+    Emails are sent using tasks with ``MAIL_BULK_CHUNK_SIZE`` emails each,
+    every task is using single smtp connection.
+    Emails are dropped if the block fails, so these are not sent again when it's retried.
+    """
+    if g.get('bulk_emails') is not None:
+        yield  # already collecting
+        return
+
+    g.bulk_emails = []
+    try:
+        yield
+    except Exception:
+        g.pop('bulk_emails')
+        raise
+
+    messages = g.pop('bulk_emails')
+    size = current_app.config.get('MAIL_BULK_CHUNK_SIZE', 100)
+    for i in range(0, len(messages), size):
+        _send_emails.apply_async(kwargs={'messages': messages[i:i + size]})
+
+
 def send_new_signup_email(user):
     app_name = current_app.config['SITE_NAME']
     url = url_for('settings.app', app_id='users', _external=True)
@@ -137,6 +204,59 @@ def send_reset_password_email(user_name, user_email, token):
     send_email(to=[user_email], subject=subject, text_body=text_body, html_body=html_body)
 
 
+def get_render_stats():
+    """Get number of notification templates rendered and reused from cache."""
+    return dict(render_stats)
+
+
+def render_notification_template(template, item, name=None, topic_name=None, **kwargs):
+    """Render notification template, reusing the output for other users.
+
+    Template is rendered once per item version, locale and other simple params
+    (section, is_admin etc.) within the app context. User name and topic name
+    are replaced in rendered template.
+
+    :param template: template name
+    :param item: item for notification
+    :param name: user name
+    :param topic_name: topic name
+    """
+    key = (
+        template,
+        item.get('_id'),
+        item.get('version'),
+        item.get('_updated'),
+        str(get_locale()),
+        bool(name),
+        bool(topic_name),
+        tuple(sorted((k, v) for k, v in kwargs.items() if v is None or isinstance(v, (str, bool, int)))),
+    )
+
+    cache = g.setdefault('notification_templates', {})
+    if key in cache:
+        render_stats['hits'] += 1
+    else:
+        render_stats['misses'] += 1
+        cache[key] = render_template(
+            template,
+            item=item,
+            name=USER_NAME_PLACEHOLDER if name else None,
+            topic_name=TOPIC_NAME_PLACEHOLDER if topic_name else None,
+            **kwargs
+        )
+
+    if template.endswith('.html'):
+        name = escape(name) if name else name
+        topic_name = escape(topic_name) if topic_name else topic_name
+
+    output = cache[key]
+    if name:
+        output = output.replace(USER_NAME_PLACEHOLDER, str(name))
+    if topic_name:
+        output = output.replace(TOPIC_NAME_PLACEHOLDER, str(topic_name))
+    return output
+
+
 def send_new_item_notification_email(user, topic_name, item, section='wire'):
     if item.get('type') == 'text':
         _send_new_wire_notification_email(user, topic_name, item, section)
@@ -158,8 +278,8 @@ def _send_new_wire_notification_email(user, topic_name, item, section):
         type='wire',
         section=section
     )
-    text_body = render_template('new_item_notification.txt', **kwargs)
-    html_body = render_template('new_item_notification.html', **kwargs)
+    text_body = render_notification_template('new_item_notification.txt', **kwargs)
+    html_body = render_notification_template('new_item_notification.html', **kwargs)
     send_email(to=recipients, subject=subject, text_body=text_body, html_body=html_body)
 
 
@@ -182,8 +302,8 @@ def _send_new_agenda_notification_email(user, topic_name, item):
         is_admin=is_admin_or_internal(user),
         section='agenda'
     )
-    text_body = render_template('new_item_notification.txt', **kwargs)
-    html_body = render_template('new_item_notification.html', **kwargs)
+    text_body = render_notification_template('new_item_notification.txt', **kwargs)
+    html_body = render_notification_template('new_item_notification.html', **kwargs)
     send_email(to=recipients, subject=subject, text_body=text_body, html_body=html_body)
 
 
@@ -199,7 +319,7 @@ def _send_history_match_wire_notification_email(user, item, section):
     url = url_for('wire.item', _id=item['guid'], _external=True)
     recipients = [user['email']]
     subject = gettext('New update for your previously accessed story: {}'.format(item['headline']))
-    text_body = render_template(
+    text_body = render_notification_template(
         'new_item_notification.txt',
         app_name=app_name,
         is_topic=False,
@@ -218,7 +338,7 @@ def _send_history_match_agenda_notification_email(user, item):
     url = url_for_agenda(item, _external=True)
     recipients = [user['email']]
     subject = gettext('New update for your previously accessed agenda: {}'.format(item['name']))
-    text_body = render_template(
+    text_body = render_notification_template(
         'new_item_notification.txt',
         app_name=app_name,
         is_topic=False,
@@ -248,7 +368,7 @@ def _send_wire_killed_notification_email(user, item):
     formatter = current_app.download_formatters['text']['formatter']
     recipients = [user['email']]
     subject = gettext('Kill/Takedown notice')
-    text_body = formatter.format_item(item)
+    text_body = format_item_cached(formatter, item)
 
     send_email(to=recipients, subject=subject, text_body=text_body)
 
@@ -257,6 +377,6 @@ def _send_agenda_killed_notification_email(user, item):
     formatter = current_app.download_formatters['text']['formatter']
     recipients = [user['email']]
     subject = gettext('Agenda cancelled notice')
-    text_body = formatter.format_item(item, item_type='agenda')
+    text_body = format_item_cached(formatter, item, item_type='agenda')
 
     send_email(to=recipients, subject=subject, text_body=text_body)
@@ -20,6 +20,7 @@ from flask_mail import Mail
 from flask_cache import Cache
 
 from newsroom.utils import is_json_request
+from newsroom.search_timings import add_timings_header
 from newsroom.gettext import setup_babel
 import newsroom
 from superdesk.logging import configure_logging
@@ -84,6 +85,7 @@ class NewsroomApp(eve.Eve):
         self.setup_email()
         self.setup_cache()
         self.setup_error_handlers()
+        self.after_request(add_timings_header)
 
         configure_logging(self.config.get('LOG_CONFIG_FILE'))
 
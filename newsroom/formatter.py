@@ -1,7 +1,17 @@
 
+import hashlib
+import logging
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app as app, has_request_context, _request_ctx_stack
 from werkzeug.utils import secure_filename
 from superdesk.utc import utcnow
 
+logger = logging.getLogger(__name__)
+
+FORMATTED_ITEM_CACHE_KEY = 'formatted_item:{}:{}'
+
 
 class BaseFormatter():
     """Base formatter class.
@@ -35,3 +45,92 @@ class BaseFormatter():
 
     def get_mediatype(self):
         return self.MEDIATYPE
+
+
+def get_formatted_item_cache_key(formatter, item, item_type=None):
+    """Get cache key for formatted item.
+
+    Key is based on formatter, item id, version and item type,
+    ``_updated`` is added to catch agenda items updated without new version.
+    Returns ``None`` if the output should not be cached.
+    """
+    if not app.config.get('FORMATTER_CACHE_TIMEOUT') or not item.get('version'):
+        return None
+    key = ':'.join([str(value) for value in (
+        item['_id'],
+        item['version'],
+        item_type,
+        item.get('_updated'),
+    )])
+    return FORMATTED_ITEM_CACHE_KEY.format(type(formatter).__name__, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+
+def format_item_cached(formatter, item, item_type=None):
+    """Format item using shared cache.
+
+    Only text outputs up to ``FORMATTER_CACHE_MAX_SIZE`` are cached,
+    cache backend evicts old entries when its size limit is reached.
+
+    :param formatter: formatter instance
+    :param item: item to format
+    :param item_type: item type passed to formatter, if not set formatter default is used
+    """
+    key = get_formatted_item_cache_key(formatter, item, item_type)
+    formatted = app.cache.get(key) if key else None
+    if formatted is not None:
+        return formatted
+
+    formatted = formatter.format_item(item, item_type=item_type) if item_type else formatter.format_item(item)
+    if key and isinstance(formatted, (str, bytes)) and len(formatted) <= app.config['FORMATTER_CACHE_MAX_SIZE']:
+        app.cache.set(key, formatted, timeout=app.config['FORMATTER_CACHE_TIMEOUT'])
+    return formatted
+
+
+def format_item_or_none(formatter, item, item_type=None):
+    """Format item, log the error and return ``None`` if it fails."""
+    try:
+        return format_item_cached(formatter, item, item_type=item_type)
+    except Exception:
+        logger.exception('Error formatting item %s using %s', item.get('_id'), type(formatter).__name__)
+
+
+def _format_in_context(ctx, formatter, item, item_type):
+    with ctx:
+        return format_item_or_none(formatter, item, item_type)
+
+
+def format_items(formatter, items, item_type=None, pool_size=None):
+    """Format multiple items, concurrently if ``pool_size`` is bigger than 1.
+
+    Generates ``(item, formatted)`` in the original order, items which fail
+    to format are skipped. At most ``pool_size * 2`` items are formatted ahead
+    of the consumer so memory is bounded for big batches.
+
+    :param formatter: formatter instance
+    :param items: list of items
+    :param item_type: item type passed to formatter
+    :param pool_size: number of formatting threads
+    """
+    if not pool_size or pool_size < 2 or len(items) < 2:
+        for item in items:
+            formatted = format_item_or_none(formatter, item, item_type)
+            if formatted is not None:
+                yield item, formatted
+        return
+
+    with ThreadPoolExecutor(max_workers=pool_size) as executor:
+        pending = deque()
+        for item in items:
+            # every thread needs its own context for ``url_for``, config and cache
+            ctx = _request_ctx_stack.top.copy() if has_request_context() else app.app_context()
+            pending.append((item, executor.submit(_format_in_context, ctx, formatter, item, item_type)))
+            yield from _pop_formatted(pending, pool_size * 2)
+        yield from _pop_formatted(pending, 0)
+
+
+def _pop_formatted(pending, limit):
+    while len(pending) > limit:
+        item, future = pending.popleft()
+        formatted = future.result()
+        if formatted is not None:
+            yield item, formatted
@@ -1,19 +1,34 @@
 
+import time
+import atexit
+import logging
+import threading
 import newsroom
 import pymongo.errors
 import werkzeug.exceptions
 
+from bson import ObjectId
 from superdesk import get_resource_service
 from superdesk.resource import not_analyzed, not_enabled
 from superdesk.utc import utcnow
-from flask import json, abort, Blueprint, jsonify
+from flask import json, abort, Blueprint, jsonify, current_app as app
 from flask_babel import gettext
 from eve.utils import ParsedRequest
+from newsroom.celery_app import celery
 from newsroom.utils import get_json_or_400
 from newsroom.auth import get_user
+from newsroom.search import get_search_after_sort, get_search_after_query, get_last_sort_values
 
+logger = logging.getLogger(__name__)
 blueprint = Blueprint('history', __name__)
 
+HISTORY_BUFFER_EXTENSION = 'newsroom_history_buffer'
+HISTORY_STRING_FIELDS = ('item', 'version', 'section', 'monitoring')
+#: history records have no unique not analyzed field in the source, so the sort is made unique
+#: using elastic ``_uid`` (``history#<_id>``), otherwise cursor pagination would skip records
+#: with the same sort values
+HISTORY_SEARCH_AFTER_TIEBREAKER = ('_uid', )
+
 
 class HistoryResource(newsroom.Resource):
     item_methods = ['GET']
@@ -73,11 +88,53 @@ class HistoryService(newsroom.Service):
                 'monitoring': monitoring,
             }
 
-        for doc in docs:
+        records = [transform(doc) for doc in docs]
+        mode = app.config.get('HISTORY_WRITE_MODE', 'sync')
+
+        if mode == 'buffer':
+            get_history_buffer().add(records)
+        elif mode == 'celery':
+            _write_history.apply_async(kwargs={'records': records})
+        else:
+            self.bulk(records)
+
+    def bulk(self, records):
+        """Write history records using single mongo insert and elastic bulk request.
+
+        In case of a duplicate it falls back to writing records one by one,
+        skipping the duplicates.
+
+        :param records: list of history records
+        :return: number of written records
+        """
+        if not records:
+            return 0
+
+        try:
+            super().create(records)
+            return len(records)
+        except (werkzeug.exceptions.Conflict, pymongo.errors.BulkWriteError):
+            pass
+
+        # records inserted before the duplicate are in mongo only
+        ids = [record['_id'] for record in records if record.get('_id')]
+        inserted = set()
+        if ids:
+            cursor = app.data.get_mongo_collection('history').find({'_id': {'$in': ids}}, projection={'_id': 1})
+            inserted = {doc['_id'] for doc in cursor}
+        if inserted:
+            self.backend.create_in_search('history', [record for record in records if record.get('_id') in inserted])
+
+        written = len(inserted)
+        for record in records:
+            if record.get('_id') in inserted:
+                continue
             try:
-                super().create([transform(doc)])
+                super().create([record])
+                written += 1
             except (werkzeug.exceptions.Conflict, pymongo.errors.BulkWriteError):
                 continue
+        return written
 
     def create_history_record(self, items, action, user, section, monitoring=None):
         self.create(items, action, user, section, monitoring)
@@ -92,11 +149,25 @@ class HistoryService(newsroom.Service):
         return super().get(req, None)
 
     def fetch_history(self, query, all=False):
+        search_after_sort = get_search_after_sort(query.get('sort'), HISTORY_SEARCH_AFTER_TIEBREAKER) if all else None
+        if search_after_sort:
+            query['sort'] = search_after_sort
+        base_query = query.get('query') or {'match_all': {}}
+
         results = self.query_items(query)
         docs = results.docs
         if all:
-            while results.hits['hits']['total'] > len(docs):
-                query['from'] = len(docs)
+            while results.hits['hits']['total'] > len(docs) and results.docs:
+                values = get_last_sort_values(results.hits, search_after_sort)
+                if values:
+                    # avoid the page limit and slow deep pages using cursor
+                    query['from'] = 0
+                    query['query'] = {'bool': {'must': [
+                        base_query,
+                        get_search_after_query(search_after_sort, values),
+                    ]}}
+                else:
+                    query['from'] = len(docs)
                 results = self.query_items(query)
                 docs.extend(results.docs)
 
@@ -106,32 +177,131 @@ class HistoryService(newsroom.Service):
         }
 
 
+class HistoryBuffer():
+    """Collects history records in process and writes them in batches.
+
+    Records are written when there are ``HISTORY_BUFFER_SIZE`` of them
+    or the oldest one is older than ``HISTORY_BUFFER_TIMEOUT`` seconds,
+    which is checked by a timer so records are written also when no other
+    request comes, and on process exit.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.records = []
+        self.started = None
+        self.timer = None
+        self.lock = threading.Lock()
+
+    def get_timeout(self):
+        return self.app.config.get('HISTORY_BUFFER_TIMEOUT', 10)
+
+    def add(self, records):
+        with self.lock:
+            if not self.records:
+                self.started = time.monotonic()
+                self.start_timer()
+            self.records.extend(records)
+            if len(self.records) < self.app.config.get('HISTORY_BUFFER_SIZE', 500) and \
+                    time.monotonic() - self.started < self.get_timeout():
+                return
+            records = self.pop()
+        self.write(records)
+
+    def start_timer(self):
+        self.timer = threading.Timer(self.get_timeout(), self.flush)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def pop(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        records, self.records = self.records, []
+        return records
+
+    def flush(self):
+        with self.lock:
+            records = self.pop()
+        if records:
+            with self.app.app_context():
+                self.write(records)
+
+    def write(self, records):
+        try:
+            get_resource_service('history').bulk(records)
+        except Exception:
+            logger.exception('Failed to write %d history records', len(records))
+
+
+def get_history_buffer():
+    buffer = app.extensions.get(HISTORY_BUFFER_EXTENSION)
+    if buffer is None:
+        buffer = HistoryBuffer(app._get_current_object())
+        app.extensions[HISTORY_BUFFER_EXTENSION] = buffer
+        atexit.register(buffer.flush)
+    return buffer
+
+
+@celery.task(soft_time_limit=300)
+def _write_history(records):
+    for record in records:
+        # celery serializer converts hex strings to ObjectId
+        for field in HISTORY_STRING_FIELDS:
+            if isinstance(record.get(field), ObjectId):
+                record[field] = str(record[field])
+    get_resource_service('history').bulk(records)
+
+
 def get_history_users(item_ids, active_user_ids, active_company_ids, section, action):
-    source = {
-        'query': {
-            'bool': {
-                'must': [
-                    {'terms': {'company': [str(a) for a in active_company_ids]}},
-                    {'terms': {'item': [str(i) for i in item_ids]}},
-                    {'term': {'section': section}},
-                    {'term': {'action': action}},
-                ]
-            }
-        },
-        'size': 25,
-        'from': 0
-    }
+    return get_history_users_by_section(item_ids, active_user_ids, active_company_ids, [section], action)[section]
+
+
+def get_history_users_by_section(item_ids, active_user_ids, active_company_ids, sections, action):
+    """Get active users who did given action on any of the items, for every section.
+
+    Uses a single multi search with terms aggregation on user per section,
+    so only distinct user ids are returned.
+
+    :return: section, user ids dictionary
+    """
+    if not sections:
+        return {}
+
+    user_ids = {str(uid) for uid in active_user_ids}
+    index = app.config['CONTENTAPI_ELASTICSEARCH_INDEX']
+    body = []
+    for section in sections:
+        body.append({'index': index, 'type': 'history'})
+        body.append({
+            'query': {
+                'bool': {
+                    'filter': [
+                        {'terms': {'company': [str(a) for a in active_company_ids]}},
+                        {'terms': {'item': [str(i) for i in item_ids]}},
+                        {'term': {'section': section}},
+                        {'term': {'action': action}},
+                    ]
+                }
+            },
+            'size': 0,
+            'aggs': {
+                'users': {'terms': {'field': 'user', 'size': max(len(user_ids), 1)}},
+            },
+        })
+
+    responses = app.data.elastic.es.msearch(body=body)['responses']
+    history_users = {}
+    for section, response in zip(sections, responses):
+        if response.get('error'):
+            logger.error('History users search failed for section %s: %s', section, response['error'])
+            history_users[section] = []
+            continue
 
-    # Get the results
-    histories = get_resource_service('history').fetch_history(source, all=True).get('items') or []
+        buckets = response.get('aggregations', {}).get('users', {}).get('buckets', [])
+        history_users[section] = [bucket['key'] for bucket in buckets if bucket['key'] in user_ids]
 
-    # Filter out the users
-    user_ids = [str(uid) for uid in active_user_ids]
-    return [
-        str(h['user'])
-        for h in histories
-        if h.get('user') in user_ids
-    ]
+    return history_users
 
 
 @blueprint.route('/history/new', methods=['POST'])
@@ -126,7 +126,7 @@ def copy(_id):
 @login_required
 def versions(_id):
     item = get_entity_or_404(_id, 'items')
-    items = get_previous_versions(item)
+    items = get_previous_versions(item, 'aapX')
     return flask.jsonify({'_items': items})
 
 
@@ -140,7 +140,7 @@ def item(_id):
         return flask.jsonify(item)
     if not item.get('_access'):
         return flask.render_template('wire_item_access_restricted.html', item=item)
-    previous_versions = get_previous_versions(item)
+    previous_versions = get_previous_versions(item, 'aapX')
     if 'print' in flask.request.args:
         template = 'wire_item_print.html'
         update_action_list([_id], 'prints', force_insert=True)
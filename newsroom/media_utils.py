@@ -1,10 +1,12 @@
 import io
+from functools import lru_cache
 from PIL import Image, ImageEnhance
 from flask import current_app as app
 from newsroom.upload import ASSETS_RESOURCE
 
 THUMBNAIL_SIZE = (640, 640)
 THUMBNAIL_QUALITY = 80
+WATERMARK_OPACITY = 0.3
 
 
 def store_image(image, filename=None, _id=None):
@@ -28,29 +30,99 @@ def store_image(image, filename=None, _id=None):
     }
 
 
+def get_rendition_id(media_id, name):
+    return '%s%s' % (media_id, '_newsroom_%s' % name)
+
+
+def get_stored_rendition(_id):
+    """Get rendition for already stored image, reading only the image header."""
+    binary = app.media.get(_id, resource=ASSETS_RESOURCE)
+    if not binary:
+        return None
+    width, height = Image.open(binary).size
+    return {
+        'media': str(_id),
+        'href': app.upload_url(_id),
+        'width': width,
+        'height': height,
+        'mimetype': 'image/jpeg'
+    }
+
+
+def get_source_rendition(picture):
+    """Get rendition used to generate thumbnails."""
+    renditions = (picture or {}).get('renditions') or {}
+    return renditions.get('4-3', renditions.get('viewImage'))
+
+
+def copy_generated_renditions(picture, original_picture):
+    """Copy generated renditions from original picture if it uses the same source."""
+    source = get_source_rendition(picture)
+    original_source = get_source_rendition(original_picture)
+    if not source or not original_source or source.get('media') != original_source.get('media'):
+        return
+    for key, rendition in original_picture['renditions'].items():
+        if key.startswith('_newsroom_'):
+            picture['renditions'].setdefault(key, rendition)
+
+
+def open_image(data, size=None):
+    """Open image from binary data.
+
+    When size is set jpeg images are decoded using lower scale which is still
+    bigger than given size, so it's much faster for thumbnails.
+    """
+    image = Image.open(io.BytesIO(data))
+    if size:
+        image.draft('RGB', size)
+    return image
+
+
 def get_thumbnail(image):
     image = image.copy()
     image.thumbnail(THUMBNAIL_SIZE)
     return image
 
 
+@lru_cache(maxsize=4)
+def load_watermark(path):
+    """Load watermark image with opacity applied, it's done once per process."""
+    with open(path, mode='rb') as watermark_binary:
+        watermark_image = Image.open(watermark_binary).convert('RGBA')
+    set_opacity(watermark_image, WATERMARK_OPACITY)
+    return watermark_image
+
+
+@lru_cache(maxsize=64)
+def get_watermark_overlay(path, size):
+    """Get part of the watermark covering image of given size and its box in the image.
+
+    :return: (box, overlay) tuple, overlay is None if watermark is out of the image
+    """
+    watermark_image = load_watermark(path)
+    x = size[0] - watermark_image.size[0]
+    y = int((size[1] - watermark_image.size[1]) * 0.66)
+    box = (
+        max(x, 0),
+        max(y, 0),
+        min(x + watermark_image.size[0], size[0]),
+        min(y + watermark_image.size[1], size[1]),
+    )
+    if box[0] >= box[2] or box[1] >= box[3]:
+        return box, None
+    return box, watermark_image.crop((box[0] - x, box[1] - y, box[2] - x, box[3] - y))
+
+
 def get_watermark(image):
-    image = image.copy()
     if not app.config.get('WATERMARK_IMAGE'):
-        return image
-    if image.mode != 'RGBA':
-        image = image.convert('RGBA')
-    with open(app.config['WATERMARK_IMAGE'], mode='rb') as watermark_binary:
-        watermark_image = Image.open(watermark_binary)
-        set_opacity(watermark_image, 0.3)
-        watermark_layer = Image.new('RGBA', image.size)
-        watermark_layer.paste(watermark_image, (
-            image.size[0] - watermark_image.size[0],
-            int((image.size[1] - watermark_image.size[1]) * 0.66),
-        ))
-
-    watermark = Image.alpha_composite(image, watermark_layer)
-    return watermark.convert('RGB')
+        return image.copy()
+    box, overlay = get_watermark_overlay(app.config['WATERMARK_IMAGE'], image.size)
+    watermark = image.convert('RGB')
+    if overlay is not None:
+        # composite only the part of image covered by watermark
+        region = image.crop(box).convert('RGBA')
+        watermark.paste(Image.alpha_composite(region, overlay).convert('RGB'), box[:2])
+    return watermark
 
 
 def set_opacity(image, opacity=1):
@@ -68,12 +140,15 @@ def generate_preview_details_renditions(picture):
     for key in ['base', 'view']:
         rendition = picture.get('renditions', {}).get('%sImage' % key)
         if rendition:
-            binary = app.media.get(rendition['media'], resource=ASSETS_RESOURCE)
-            im = Image.open(binary)
-            watermark = get_watermark(im)
+            _id = get_rendition_id(rendition['media'], key)
+            stored = get_stored_rendition(_id)
+            if not stored:
+                binary = app.media.get(rendition['media'], resource=ASSETS_RESOURCE)
+                im = open_image(binary.read())
+                watermark = get_watermark(im)
+                stored = store_image(watermark, _id=_id)
             picture['renditions'].update({
-                '_newsroom_%s' % key: store_image(watermark,
-                                                  _id='%s%s' % (rendition['media'], '_newsroom_%s' % key))
+                '_newsroom_%s' % key: stored
             })
 
 
@@ -83,21 +158,26 @@ def generate_renditions(item):
         return
 
     # use 4-3 rendition for generated thumbs
-    renditions = picture.get('renditions', {})
-    rendition = renditions.get('4-3', renditions.get('viewImage'))
+    rendition = get_source_rendition(picture)
     if not rendition:
         return
 
-    # generate thumbnails
-    binary = app.media.get(rendition['media'], resource=ASSETS_RESOURCE)
-    im = Image.open(binary)
-    thumbnail = get_thumbnail(im)  # 4-3 rendition resized
-    watermark = get_watermark(im)  # 4-3 rendition with watermark
+    # skip generating thumbnails when stored already
+    thumbnail_id = get_rendition_id(rendition['media'], 'thumbnail')
+    thumbnail_large_id = get_rendition_id(rendition['media'], 'thumbnail_large')
+    thumbnail = get_stored_rendition(thumbnail_id)
+    thumbnail_large = get_stored_rendition(thumbnail_large_id)
+
+    if not thumbnail or not thumbnail_large:
+        data = app.media.get(rendition['media'], resource=ASSETS_RESOURCE).read()
+        thumbnail = store_image(get_thumbnail(open_image(data, THUMBNAIL_SIZE)),
+                                _id=thumbnail_id)  # 4-3 rendition resized
+        thumbnail_large = store_image(get_watermark(open_image(data)),
+                                      _id=thumbnail_large_id)  # 4-3 rendition with watermark
+
     picture['renditions'].update({
-        '_newsroom_thumbnail': store_image(thumbnail,
-                                           _id='%s%s' % (rendition['media'], '_newsroom_thumbnail')),
-        '_newsroom_thumbnail_large': store_image(watermark,
-                                                 _id='%s%s' % (rendition['media'], '_newsroom_thumbnail_large')),
+        '_newsroom_thumbnail': thumbnail,
+        '_newsroom_thumbnail_large': thumbnail_large,
     })
     app.generate_preview_details_renditions(picture)
 
@@ -261,6 +261,11 @@ class MonitoringEmailAlerts(Command):
         return email_addresses
 
     def send_alerts(self, monitoring_list, created_from, created_from_time, now):
+        from newsroom.email import bulk_emails
+        with bulk_emails():
+            self._send_alerts(monitoring_list, created_from, created_from_time, now)
+
+    def _send_alerts(self, monitoring_list, created_from, created_from_time, now):
         general_settings = get_settings_collection().find_one(GENERAL_SETTINGS_LOOKUP)
         error_recipients = []
         if general_settings and general_settings['values'].get('system_alerts_recipients'):
@@ -1,7 +1,7 @@
 import newsroom
 import superdesk
 
-from newsroom.products.products import get_products_by_company
+from newsroom.products.products import get_products_by_company, bump_products_version
 
 
 class NavigationsResource(newsroom.Resource):
@@ -47,7 +47,10 @@ class NavigationsResource(newsroom.Resource):
 
 
 class NavigationsService(newsroom.Service):
-    pass
+    def on_deleted(self, doc):
+        super().on_deleted(doc)
+        # products are updated when navigation is removed
+        bump_products_version()
 
 
 def get_navigations_by_company(company_id, product_type='wire', events_only=False):
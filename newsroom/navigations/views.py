@@ -8,7 +8,7 @@ from superdesk import get_resource_service
 
 from newsroom.decorator import admin_only
 from newsroom.navigations import blueprint
-from newsroom.products.products import get_products_by_navigation
+from newsroom.products.products import get_products_by_navigation, bump_products_version
 from newsroom.utils import get_json_or_400, get_entity_or_404, query_resource, set_original_creator,\
     set_version_creator, clean_navigation, is_safe_string, clean_product
 from newsroom.upload import get_file
@@ -132,5 +132,6 @@ def save_navigation_products(_id):
                 db.update_one({'_id': product['_id']}, {'$addToSet': {'navigations': _id}})
             else:
                 db.update_one({'_id': product['_id']}, {'$pull': {'navigations': _id}})
+        bump_products_version()
 
         return jsonify(), 200
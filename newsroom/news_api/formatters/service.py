@@ -8,6 +8,7 @@ from datetime import timedelta
 from superdesk.utc import utcnow
 from newsroom.settings import get_setting
 from newsroom import Service
+from newsroom.formatter import format_item_cached
 
 
 class APIFormattersService(Service):
@@ -42,5 +43,5 @@ class APIFormattersService(Service):
         if utcnow() - timedelta(days=int(get_setting('news_api_time_limit_days'))) > item.get('versioncreated',
                                                                                               utcnow()):
             abort(404)
-        ret = formatter.format_item(item)
+        ret = format_item_cached(formatter, item)
         return {'formatted_item': ret, 'mimetype': formatter.MIMETYPE, 'version': item.get('version')}
@@ -53,6 +53,7 @@ class NewsAPINewsService(BaseSearchService):
 
     section = 'news_api'
     limit_days_setting = 'news_api_time_limit_days'
+    search_after = False
 
     def get(self, req, lookup):
         resp = super().get(req, lookup)
@@ -87,9 +88,11 @@ class NewsAPINewsService(BaseSearchService):
         self.prefill_search_args(search, req)
         self.prefill_search_lookup(search, lookup)
         self.prefill_search_page(search)
-        self.prefill_search_company(search)
+        with search.timings.stage('prefill_company'):
+            self.prefill_search_company(search)
         self.prefill_search_section(search)
-        self.prefill_search_products(search)
+        with search.timings.stage('prefill_products'):
+            self.prefill_search_products(search)
         self.prefill_search_items(search)
 
     def apply_filters(self, search):
@@ -98,14 +101,15 @@ class NewsAPINewsService(BaseSearchService):
         :param newsroom.search.SearchQuery search: the search query instance
         """
 
-        self.apply_section_filter(search)
-        self.apply_company_filter(search)
-        self.apply_products_filter(search)
+        with self.permissions_filter(search):
+            self.apply_section_filter(search)
+            self.apply_company_filter(search)
+            self.apply_products_filter(search)
+            self.apply_time_limit_filter(search)
         self.apply_fields_filter(search)
         self.apply_date_filter(search)
         self.apply_request_filter(search)
         self.apply_projections(search)
-        self.apply_time_limit_filter(search)
 
         if len(search.query['bool'].get('should', [])):
             search.query['bool']['minimum_should_match'] = 1
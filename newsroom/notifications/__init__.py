@@ -1,9 +1,12 @@
 import flask
+import logging
+import pymongo.errors
 import superdesk
 
 from superdesk.notification import push_notification  # noqa
 from newsroom.auth import get_user_id
 
+logger = logging.getLogger(__name__)
 blueprint = flask.Blueprint('notifications', __name__)
 
 
@@ -11,8 +14,14 @@ def push_user_notification(name, **kwargs):
     push_notification(':'.join(map(str, [name, get_user_id()])), **kwargs)
 
 
-from .notifications import NotificationsResource, NotificationsService, get_user_notifications  # noqa
+from .notifications import NotificationsResource, NotificationsService, get_user_notifications, init_ttl_index  # noqa
 
 
 def init_app(app):
     superdesk.register_resource('notifications', NotificationsResource, NotificationsService, _app=app)
+
+    with app.app_context():
+        try:
+            init_ttl_index(app)
+        except pymongo.errors.PyMongoError as error:
+            logger.warning('Could not create notifications ttl index: %s', error)
@@ -1,14 +1,21 @@
 
+import logging
 import datetime
 import newsroom
 import superdesk
 import pymongo.errors
-import werkzeug.exceptions
 
 from bson import ObjectId
+from eve.utils import config, document_etag
+from pymongo import UpdateOne
 from superdesk.utc import utcnow
 from flask import current_app as app, session
 
+logger = logging.getLogger(__name__)
+
+TTL_INDEX_NAME = 'created_ttl'
+DUPLICATE_KEY_ERROR = 11000
+
 
 class NotificationsResource(newsroom.Resource):
     url = 'users/<regex("[a-f0-9]{24}"):user>/notifications'
@@ -34,18 +41,76 @@ class NotificationsResource(newsroom.Resource):
 
 class NotificationsService(newsroom.Service):
     def create(self, docs):
+        self.upsert(docs)
+        return [get_notification_id(doc) for doc in docs]
+
+    def upsert(self, docs):
+        """Create notifications or refresh created time of existing ones.
+
+        All the notifications are written using a single unordered bulk write.
+
+        :param docs: list of dicts with ``user`` and ``item``
+        :return: dict with number of ``inserted`` and ``refreshed`` notifications
+        """
         now = utcnow()
+        requests = {}
 
         for doc in docs:
-            id = '_'.join(map(str, [doc['user'], doc['item']]))
-            try:
-                super().create([{
-                    '_id': id,
-                    'created': now, 'user': ObjectId(doc['user']), 'item': doc['item']
-                }])
-            except (werkzeug.exceptions.Conflict, pymongo.errors.BulkWriteError):
-                original = super().find_one(req=None, _id=id)
-                super().update(id=id, updates={'created': now}, original=original)
+            _id = get_notification_id(doc)
+            notification = {'_id': _id, 'user': ObjectId(doc['user']), 'item': doc['item'], 'created': now}
+            requests[_id] = UpdateOne({'_id': _id}, {
+                '$set': {
+                    'created': now,
+                    config.LAST_UPDATED: now,
+                    config.ETAG: document_etag(notification),
+                },
+                '$setOnInsert': {
+                    'user': notification['user'],
+                    'item': notification['item'],
+                    config.DATE_CREATED: now,
+                },
+            }, upsert=True)
+
+        counts = {'inserted': 0, 'refreshed': 0}
+        if requests:
+            self._bulk_write(list(requests.values()), counts)
+        return counts
+
+    def _bulk_write(self, requests, counts, retry=True):
+        collection = app.data.get_mongo_collection('notifications')
+        try:
+            result = collection.bulk_write(requests, ordered=False)
+            counts['inserted'] += result.upserted_count
+            counts['refreshed'] += result.matched_count
+        except pymongo.errors.BulkWriteError as error:
+            counts['inserted'] += error.details.get('nUpserted', 0)
+            counts['refreshed'] += error.details.get('nMatched', 0)
+            errors = error.details.get('writeErrors') or []
+            # concurrent upserts of the same notification can fail on unique _id,
+            # those will match the existing document when done again
+            if not retry or any(err.get('code') != DUPLICATE_KEY_ERROR for err in errors):
+                raise
+            self._bulk_write([requests[err['index']] for err in errors], counts, retry=False)
+
+
+def get_notification_id(doc):
+    return '_'.join(map(str, [doc['user'], doc['item']]))
+
+
+def init_ttl_index(app):
+    """Create index expiring notifications older than ``NOTIFICATIONS_TTL`` days.
+
+    When the index exists with different expiration it's modified.
+    """
+    seconds = int(app.config.get('NOTIFICATIONS_TTL', 1) * 24 * 60 * 60)
+    collection = app.data.get_mongo_collection('notifications')
+    try:
+        collection.create_index([('created', 1)], name=TTL_INDEX_NAME, expireAfterSeconds=seconds, background=True)
+    except pymongo.errors.OperationFailure:
+        collection.database.command('collMod', collection.name, index={
+            'keyPattern': {'created': 1},
+            'expireAfterSeconds': seconds,
+        })
 
 
 def get_user_notifications(user_id):
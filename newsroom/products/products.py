@@ -1,8 +1,9 @@
-from bson import ObjectId
-
 import newsroom
 import superdesk
-from newsroom.utils import clean_product
+from newsroom.utils import clean_product, get_versioned_cache, bump_cache_version
+from newsroom.topics.percolator import queue_topics_update
+
+PRODUCTS_CACHE = 'products'
 
 
 class ProductsResource(newsroom.Resource):
@@ -57,42 +58,81 @@ class ProductsResource(newsroom.Resource):
 
 
 class ProductsService(newsroom.Service):
-    pass
+    def on_created(self, docs):
+        super().on_created(docs)
+        queue_topics_update(company_ids=[c for doc in docs for c in doc.get('companies') or []])
+        bump_products_version()
 
+    def on_updated(self, updates, original):
+        super().on_updated(updates, original)
+        queue_topics_update(company_ids=set((original.get('companies') or []) + (updates.get('companies') or [])))
+        bump_products_version()
 
-def _get_navigation_query(ids):
-    return {'$in': [str(oid) for oid in ids]} \
-        if type(ids) is list \
-        else str(ids)
+    def on_deleted(self, doc):
+        super().on_deleted(doc)
+        queue_topics_update(company_ids=doc.get('companies') or [])
+        bump_products_version()
 
 
-def get_products_by_navigation(navigation_id, product_type=None):
-    lookup = {
-        'is_enabled': True,
-        'navigations': _get_navigation_query(navigation_id)
+def bump_products_version():
+    """Invalidate enabled products snapshot in all processes.
+
+    Must be called when products are modified without using the service.
+    """
+    bump_cache_version(PRODUCTS_CACHE)
+
+
+def load_products():
+    products = superdesk.get_resource_service('products').get(req=None, lookup={'is_enabled': True})
+    return {
+        'products': [clean_product(product) for product in products],
+        'lookups': {},
     }
 
-    if product_type is not None:
-        lookup['product_type'] = product_type
 
-    return [clean_product(product) for product in superdesk.get_resource_service('products').get(req=None,
-                                                                                                 lookup=lookup)]
+def filter_products(key, test):
+    """Get enabled products passing the test.
 
+    Results are kept in the products snapshot using given key,
+    so it's computed once per process until products change.
 
-def get_product_by_id(product_id, product_type=None, company_id=None):
-    lookup = {
-        '_id': ObjectId(product_id),
-        'is_enabled': True
-    }
+    :param key: lookup key
+    :param test: function testing the product
+    """
+    snapshot = get_versioned_cache(PRODUCTS_CACHE, load_products)
+    if key not in snapshot['lookups']:
+        snapshot['lookups'][key] = [product for product in snapshot['products'] if test(product)]
+    return list(snapshot['lookups'][key])
 
-    if company_id is not None:
-        lookup['companies'] = str(company_id)
 
-    if product_type is not None:
-        lookup['product_type'] = product_type
+def _get_navigation_key(ids):
+    return tuple(sorted(str(oid) for oid in ids)) if type(ids) is list else (str(ids), )
 
-    return [clean_product(product) for product in superdesk.get_resource_service('products').get(req=None,
-                                                                                                 lookup=lookup)]
+
+def _has_navigation(product, navigation_key):
+    return any(str(navigation) in navigation_key for navigation in product.get('navigations') or [])
+
+
+def _has_company(product, company_id):
+    return str(company_id) in [str(company) for company in product.get('companies') or []]
+
+
+def get_products_by_navigation(navigation_id, product_type=None):
+    navigation_key = _get_navigation_key(navigation_id)
+    return filter_products(
+        ('navigation', navigation_key, product_type),
+        lambda product: _has_navigation(product, navigation_key) and
+        (product_type is None or product.get('product_type') == product_type)
+    )
+
+
+def get_product_by_id(product_id, product_type=None, company_id=None):
+    return filter_products(
+        ('product', str(product_id), product_type, company_id and str(company_id)),
+        lambda product: str(product['_id']) == str(product_id) and
+        (company_id is None or _has_company(product, company_id)) and
+        (product_type is None or product.get('product_type') == product_type)
+    )
 
 
 def get_products_by_company(company_id, navigation_id=None, product_type=None):
@@ -102,18 +142,14 @@ def get_products_by_company(company_id, navigation_id=None, product_type=None):
     :param navigation_id: Navigation Id
     :param product_type: Type of the product
     """
-    lookup = {'is_enabled': True, 'companies': str(company_id)}
-    if navigation_id:
-        lookup['navigations'] = _get_navigation_query(navigation_id)
-    if product_type:
-        lookup['product_type'] = product_type
-
-    products = [clean_product(product) for product in superdesk.get_resource_service('products').get(req=None,
-                                                                                                     lookup=lookup)]
-    return products
+    navigation_key = _get_navigation_key(navigation_id) if navigation_id else None
+    return filter_products(
+        ('company', str(company_id), navigation_key, product_type or None),
+        lambda product: _has_company(product, company_id) and
+        (not navigation_key or _has_navigation(product, navigation_key)) and
+        (not product_type or product.get('product_type') == product_type)
+    )
 
 
 def get_products_dict_by_company(company_id):
-    lookup = {'is_enabled': True, 'companies': str(company_id)}
-    return [clean_product(product) for product in superdesk.get_resource_service('products').get(req=None,
-                                                                                                 lookup=lookup)]
+    return get_products_by_company(company_id)
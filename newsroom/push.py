@@ -10,15 +10,21 @@ from flask_babel import gettext
 from superdesk.text_utils import get_word_count, get_char_count
 
 from superdesk.utc import utcnow
+from superdesk.lock import lock, unlock
+from newsroom.celery_app import celery
 from newsroom.notifications import push_notification
 from newsroom.topics.topics import get_wire_notification_topics, get_agenda_notification_topics
-from newsroom.utils import parse_dates, get_user_dict, get_company_dict, parse_date_str
+from newsroom.topics import percolator as topics_percolator
+from newsroom.utils import parse_dates, get_user_dict, get_company_dict, parse_date_str, get_entity_dict, \
+    get_items_by_id
 from newsroom.email import send_new_item_notification_email, \
-    send_history_match_notification_email, send_item_killed_notification_email
-from newsroom.history import get_history_users
-from newsroom.wire.views import HOME_ITEMS_CACHE_KEY
+    send_history_match_notification_email, send_item_killed_notification_email, bulk_emails, get_render_stats
+from newsroom.history import get_history_users_by_section
+from newsroom.wire.views import delete_home_card_items_cache
 from newsroom.wire import url_for_wire
+from newsroom.search import bump_aggregations_version
 from newsroom.upload import ASSETS_RESOURCE
+from newsroom.media_utils import get_source_rendition, copy_generated_renditions
 from newsroom.signals import publish_item as publish_item_signal
 from newsroom.agenda.utils import get_latest_available_delivery, TO_BE_CONFIRMED_FIELD
 
@@ -28,6 +34,8 @@ logger = logging.getLogger(__name__)
 blueprint = flask.Blueprint('push', __name__)
 
 KEY = 'PUSH_KEY'
+AGENDA_TYPES = ('event', 'planning', 'planning_featured')
+RENDITIONS_LOCK_EXPIRE = 310  # longer than the renditions task time limit
 
 
 def test_signature(request):
@@ -66,32 +74,196 @@ def push():
     assert 'guid' in item or '_id' in item, {'guid': 1}
     assert 'type' in item, {'type': 1}
 
-    if item.get('type') == 'event':
-        orig = app.data.find_one('agenda', req=None, guid=item['guid'])
-        id = publish_event(item, orig)
-        agenda = app.data.find_one('agenda', req=None, _id=id)
-        if agenda:
-            superdesk.get_resource_service('agenda').enhance_items([agenda])
-        notify_new_item(agenda, check_topics=True)
-    elif item.get('type') == 'planning':
-        published = publish_planning(item)
-        agenda = app.data.find_one('agenda', req=None, _id=published['_id'])
-        if agenda:
-            superdesk.get_resource_service('agenda').enhance_items([agenda])
-        notify_new_item(agenda, check_topics=True)
-    elif item.get('type') == 'text':
+    if item.get('type') == 'text':
         orig = superdesk.get_resource_service('items').find_one(req=None, _id=item['guid'])
         item['_id'] = publish_item(item, orig)
-        notify_new_item(item, check_topics=orig is None)
-    elif item['type'] == 'planning_featured':
-        publish_planning_featured(item)
+        notify_new_item_async(item, check_topics=orig is None)
+        delete_home_card_items_cache([item, orig] if orig else [item])
+        bump_aggregations_version('items')
+    elif item.get('type') in AGENDA_TYPES:
+        push_agenda_item(item)
     else:
         flask.abort(400, gettext('Unknown type {}'.format(item.get('type'))))
 
-    app.cache.delete(HOME_ITEMS_CACHE_KEY)
     return flask.jsonify({})
 
 
+@blueprint.route('/push_batch', methods=['POST'])
+def push_batch():
+    """Push multiple items using single signed request.
+
+    Text items are stored using single ``content_api`` create call,
+    other types are processed one by one. Response contains result for
+    every item in the order items were sent, so partial failures are visible.
+    """
+    assert_test_signature(flask.request)
+    items = flask.json.loads(flask.request.get_data())
+    assert isinstance(items, list), {'items': 1}
+
+    results = [None] * len(items)
+    text_items = []
+    agenda_originals = AgendaOriginals([item for item in items if isinstance(item, dict) and
+                                        item.get('type') in AGENDA_TYPES])
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not (item.get('guid') or item.get('_id')):
+            results[index] = push_result(item, error=gettext('Missing guid'))
+        elif item.get('type') == 'text':
+            text_items.append((index, item))
+        elif item.get('type') in AGENDA_TYPES:
+            try:
+                results[index] = push_result(item, _id=push_agenda_item(item, agenda_originals))
+            except Exception as ex:
+                logger.exception(ex)
+                results[index] = push_result(item, error=str(ex))
+        else:
+            results[index] = push_result(item, error=gettext('Unknown type {}'.format(item.get('type'))))
+
+    if text_items:
+        delete_home_card_items_cache(publish_items(text_items, results))
+        bump_aggregations_version('items')
+
+    return flask.jsonify({'_items': results})
+
+
+def push_result(item, _id=None, error=None):
+    result = {
+        'guid': (item.get('guid') or item.get('_id')) if isinstance(item, dict) else None,
+        'status': 'ERR' if error else 'OK',
+    }
+    if error:
+        result['error'] = error
+    else:
+        result['_id'] = _id
+    return result
+
+
+class AgendaOriginals():
+    """Agenda items referenced by pushed events and plannings, fetched using single query.
+
+    Lookups for ids which were not prefetched go to the database,
+    items changed while processing the batch are read again.
+
+    :param items: pushed agenda items
+    """
+
+    def __init__(self, items):
+        self.guids = {item['guid'] for item in items if item.get('guid')}
+        self.ids = self.guids | {item['event_item'] for item in items if item.get('event_item')}
+        self.by_id = {}
+        self.by_guid = {}
+        if self.ids:
+            lookup = {'$or': [{'_id': {'$in': list(self.ids)}}, {'guid': {'$in': list(self.guids)}}]}
+            for doc in superdesk.get_resource_service('agenda').find(where=lookup):
+                self.by_id[doc['_id']] = doc
+                if doc.get('guid'):
+                    self.by_guid[doc['guid']] = doc
+
+    def find_one(self, _id=None, guid=None):
+        """Find agenda item by ``_id`` or ``guid``."""
+        if _id is not None:
+            return self.by_id.get(_id) if _id in self.ids else app.data.find_one('agenda', req=None, _id=_id)
+        return self.by_guid.get(guid) if guid in self.guids else app.data.find_one('agenda', req=None, guid=guid)
+
+    def discard(self, _id):
+        """Forget agenda item updated or created while processing the batch."""
+        doc = self.by_id.pop(_id, None)
+        self.ids.discard(_id)
+        self.guids.discard(_id)
+        if doc and doc.get('guid'):
+            self.by_guid.pop(doc['guid'], None)
+            self.guids.discard(doc['guid'])
+
+
+def push_agenda_item(item, originals=None):
+    """Publish event, planning or featured planning item and notify users.
+
+    :param item: event or planning item
+    :param originals: :class:`AgendaOriginals` prefetched for batch, items are fetched one by one if not set
+    :return: agenda _id
+    """
+    if originals is None:
+        originals = AgendaOriginals([])
+    if item['type'] == 'event':
+        orig = originals.find_one(guid=item['guid'])
+        _id = publish_event(item, orig)
+        originals.discard(item['guid'])
+    elif item['type'] == 'planning':
+        _id = publish_planning(item, originals)['_id']
+    else:
+        publish_planning_featured(item)
+        return item['_id']
+
+    originals.discard(_id)
+    bump_aggregations_version('agenda')
+    agenda = app.data.find_one('agenda', req=None, _id=_id)
+    if agenda and not app.config.get('NOTIFY_NEW_ITEM_ASYNC'):
+        # otherwise it's done by the notifications worker
+        superdesk.get_resource_service('agenda').enhance_items([agenda])
+    notify_new_item_async(agenda, check_topics=True)
+    return _id
+
+
+def publish_items(indexed_items, results):
+    """Publish multiple text items at once.
+
+    Originals are fetched using single query and items are stored
+    using single ``content_api`` create call.
+
+    :param indexed_items: list of (index, item) tuples
+    :param results: list of results to populate using item index
+    :return: list of published items and their originals
+    """
+    originals = get_entity_dict(get_items_by_id([item.get('guid') or item.get('_id') for _, item in indexed_items],
+                                                'items'))
+    prepared = []
+    for index, item in indexed_items:
+        try:
+            item.setdefault('guid', item['_id'])
+            original = originals.get(item['guid'])
+            parent_item = prepare_item(item, original)
+        except Exception as ex:
+            logger.exception(ex)
+            results[index] = push_result(item, error=str(ex))
+            continue
+        prepared.append((index, item, original, parent_item))
+
+    if not prepared:
+        return []
+
+    service = get_content_api_service()
+    try:
+        ids = service.create([item for _, item, _, _ in prepared])
+    except Exception as ex:
+        # content api create updates existing items, so it is safe to store them again one by one
+        logger.warning('Failed to publish %d items at once, publishing one by one: %s', len(prepared), ex)
+        ids = []
+        for index, item, _, _ in prepared:
+            try:
+                ids.append(service.create([item])[0])
+            except Exception as ex:
+                logger.exception(ex)
+                results[index] = push_result(item, error=str(ex))
+                ids.append(None)
+
+    published = []
+    for (index, item, original, parent_item), _id in zip(prepared, ids):
+        if _id is None:
+            continue
+        published.append(item)
+        if original:
+            published.append(original)
+        try:
+            finalize_item(item, _id, original, parent_item)
+            item['_id'] = _id
+            notify_new_item_async(item, check_topics=original is None)
+            results[index] = push_result(item, _id=_id)
+        except Exception as ex:
+            logger.exception(ex)
+            results[index] = push_result(item, error=str(ex))
+
+    return published
+
+
 def set_dates(doc):
     now = utcnow()
     parse_dates(doc)
@@ -103,13 +275,28 @@ def set_dates(doc):
 
 def publish_item(doc, original):
     """Duplicating the logic from content_api.publish service."""
+    parent_item = prepare_item(doc, original)
+    service = get_content_api_service()
+    _id = service.create([doc])[0]
+    finalize_item(doc, _id, original, parent_item)
+    return _id
+
+
+def get_content_api_service():
+    service = superdesk.get_resource_service('content_api')
+    service.datasource = 'items'
+    return service
+
+
+def prepare_item(doc, original):
+    """Prepare text item for publishing, returns parent item if item is evolved from another one."""
     set_dates(doc)
     doc['firstpublished'] = parse_date_str(doc.get('firstpublished'))
     doc['publish_schedule'] = parse_date_str(doc.get('publish_schedule'))
     doc.setdefault('wordcount', get_word_count(doc.get('body_html', '')))
     doc.setdefault('charcount', get_char_count(doc.get('body_html', '')))
-    service = superdesk.get_resource_service('content_api')
-    service.datasource = 'items'
+    service = get_content_api_service()
+    parent_item = None
 
     if 'evolvedfrom' in doc:
         parent_item = service.find_one(req=None, _id=doc['evolvedfrom'])
@@ -127,7 +314,12 @@ def publish_item(doc, original):
         if assoc:
             assoc.setdefault('subscribers', [])
     if doc.get('associations', {}).get('featuremedia'):
-        app.generate_renditions(doc)
+        if app.config.get('RENDITIONS_ASYNC'):
+            # reuse renditions if the picture is not changed, others are generated in worker
+            copy_generated_renditions(doc['associations']['featuremedia'],
+                                      ((original or {}).get('associations') or {}).get('featuremedia'))
+        else:
+            app.generate_renditions(doc)
 
     # If there is a function defined that generates renditions for embedded images call it.
     if app.generate_embed_renditions:
@@ -137,18 +329,64 @@ def publish_item(doc, original):
         if doc.get('coverage_id'):
             agenda_items = superdesk.get_resource_service('agenda').set_delivery(doc)
             if agenda_items:
-                [notify_new_item(item, check_topics=False) for item in agenda_items]
+                [notify_new_item_async(item, check_topics=False) for item in agenda_items]
     except Exception as ex:
         logger.info('Failed to notify new wire item for Agenda watches')
         logger.exception(ex)
 
     publish_item_signal.send(app._get_current_object(), item=doc, is_new=original is None)
-    _id = service.create([doc])[0]
+    return parent_item
+
+
+def finalize_item(doc, _id, original, parent_item):
+    """Update related documents once the item is stored."""
+    service = get_content_api_service()
     if 'associations' not in doc and original is not None and bool(original.get('associations', {})):
         service.patch(_id, updates={'associations': None})
     if 'evolvedfrom' in doc and parent_item:
         service.system_update(parent_item['_id'], {'nextversion': _id}, parent_item)
-    return _id
+    if app.config.get('RENDITIONS_ASYNC'):
+        queue_renditions(_id, doc)
+
+
+def queue_renditions(_id, doc):
+    """Queue generating of featuremedia renditions which are missing."""
+    picture = (doc.get('associations') or {}).get('featuremedia')
+    source = get_source_rendition(picture)
+    if not source or picture['renditions'].get('_newsroom_thumbnail'):
+        return
+    _generate_renditions.apply_async(kwargs={'item_id': _id, 'media_id': source['media']})
+
+
+@celery.task(bind=True, soft_time_limit=300, max_retries=5)
+def _generate_renditions(self, item_id, media_id):
+    """Generate featuremedia renditions in a worker and update the item.
+
+    Only one job is generating renditions for a picture at a time,
+    others are retried once the lock expires and will reuse stored renditions.
+    """
+    media_id = str(media_id)  # hex ids are converted to ObjectId by the serializer
+    key = 'generate_renditions:{}'.format(media_id)
+    if not lock(key, expire=RENDITIONS_LOCK_EXPIRE):
+        raise self.retry(countdown=RENDITIONS_LOCK_EXPIRE)
+
+    try:
+        service = get_content_api_service()
+        original = service.find_one(req=None, _id=item_id)
+        picture = ((original or {}).get('associations') or {}).get('featuremedia')
+        source = get_source_rendition(picture)
+        if not source or str(source.get('media')) != media_id:
+            logger.info('Featuremedia %s was removed from item %s, skipping renditions', media_id, item_id)
+            return
+        if picture['renditions'].get('_newsroom_thumbnail'):
+            return  # generated by other job meanwhile
+
+        updates = {'associations': deepcopy(original['associations'])}
+        app.generate_renditions(updates)
+        service.system_update(item_id, updates, original)
+        delete_home_card_items_cache([original])
+    finally:
+        unlock(key)
 
 
 def publish_event(event, orig):
@@ -240,8 +478,10 @@ def get_event_dates(event):
     return dates
 
 
-def publish_planning(planning):
+def publish_planning(planning, originals=None):
     logger.debug('publishing planning %s', planning)
+    if originals is None:
+        originals = AgendaOriginals([])
     service = superdesk.get_resource_service('agenda')
     agenda = None
 
@@ -251,11 +491,7 @@ def publish_planning(planning):
     if planning.get('event_item'):
         # this is a planning for an event item
         # if there's an event then _id field will have the same value as event_id
-        orig_agenda = None
-        orig_agendas = superdesk.get_resource_service('agenda').find(where={'_id': {'$in': [planning['event_item'],
-                                                                                            planning['guid']]}})
-        if orig_agendas.count() > 0:
-            orig_agenda = orig_agendas[0]
+        orig_agenda = originals.find_one(_id=planning['event_item']) or originals.find_one(_id=planning['guid'])
 
         agenda = deepcopy(orig_agenda)
         if not agenda:
@@ -275,7 +511,7 @@ def publish_planning(planning):
 
     else:
         # there's no event item (ad-hoc planning item)
-        orig_agenda = app.data.find_one('agenda', req=None, _id=planning['guid']) or {}
+        orig_agenda = originals.find_one(_id=planning['guid']) or {}
         agenda = deepcopy(orig_agenda)
         init_adhoc_agenda(planning, agenda)
 
@@ -583,7 +819,84 @@ def set_item_reference(coverage):
                                                     'coverage_id': coverage.get('coverage_id')})
             item['planning_id'] = coverage.get('planning_id')
             item['coverage_id'] = coverage.get('coverage_id')
-            notify_new_item(item, check_topics=False)
+            notify_new_item_async(item, check_topics=False)
+
+
+def notify_new_item_async(item, check_topics=True):
+    """Notify users about new item.
+
+    If ``NOTIFY_NEW_ITEM_ASYNC`` is enabled it only queues a celery task
+    which will run the notifications in a worker, otherwise it notifies users
+    right away.
+    """
+    if not item or item.get('type') == 'composite':
+        return
+
+    if not app.config.get('NOTIFY_NEW_ITEM_ASYNC'):
+        return notify_new_item(item, check_topics=check_topics)
+
+    _notify_new_item.apply_async(kwargs={
+        'item_id': str(item['_id']),
+        'resource': 'items' if item.get('type') == 'text' else 'agenda',
+        'version': get_notify_version(item),
+        'check_topics': check_topics,
+    })
+
+
+def get_notify_version(item):
+    """Get version used to deduplicate notifications.
+
+    Agenda items are updated without changing the version, so use the update time for those.
+    """
+    if item.get('type') == 'text':
+        return item.get('version')
+    return item.get('_updated')
+
+
+def get_notify_new_item_key(item_id, version):
+    return 'notify_new_item:{}:{}'.format(item_id, version)
+
+
+@celery.task(bind=True, soft_time_limit=600, max_retries=3, default_retry_delay=30)
+def _notify_new_item(self, item_id, resource, version=None, check_topics=True):
+    """Run new item notifications in a worker.
+
+    Task is idempotent for given item id and version, so it's safe to retry it
+    or to get it queued multiple times.
+    """
+    key = get_notify_new_item_key(item_id, version)
+    if app.cache.get(key):
+        logger.info('Notifications for item %s version %s were already sent', item_id, version)
+        return
+
+    if not lock(key, expire=610):
+        logger.info('Notifications for item %s version %s are being sent', item_id, version)
+        return
+
+    try:
+        # celery serializer might cast the id
+        item = app.data.find_one(resource, req=None, _id=str(item_id))
+        if not item:
+            logger.warning('Item %s not found in %s, skipping notifications', item_id, resource)
+            return
+
+        if resource == 'items' and version is not None and str(item.get('version')) != str(version):
+            # there is a newer version which will get its own notifications
+            logger.info('Item %s version %s was updated, skipping notifications', item_id, version)
+            return
+
+        if resource == 'agenda':
+            superdesk.get_resource_service('agenda').enhance_items([item])
+
+        # emails are sent once all notifications are done, so retry won't send these again
+        with bulk_emails():
+            notify_new_item(item, check_topics=check_topics)
+        app.cache.set(key, 1, timeout=app.config.get('NOTIFY_NEW_ITEM_DONE_TTL', 3600))
+    except Exception as exc:
+        logger.exception(exc)
+        raise self.retry(exc=exc)
+    finally:
+        unlock(key)
 
 
 def notify_new_item(item, check_topics=True):
@@ -605,6 +918,7 @@ def notify_new_item(item, check_topics=True):
             notify_agenda_topic_matches(item, user_dict)
 
     notify_user_matches(item, user_dict, company_dict, user_ids, company_ids)
+    logger.debug('Notification templates rendered: %(misses)d, reused: %(hits)d', get_render_stats())
 
 
 def notify_user_matches(item, users_dict, companies_dict, user_ids, company_ids):
@@ -614,18 +928,26 @@ def notify_user_matches(item, users_dict, companies_dict, user_ids, company_ids)
     related_items.append(item['_id'])
     is_text = item.get('type') == 'text'
 
-    users_processed = []
+    users_processed = set()
+
+    sections = ['wire'] + [
+        section['_id']
+        for section in app.sections
+        if section['_id'] != 'wire' and section['group'] not in ['api', 'monitoring']
+    ]
+
+    # Get users who have downloaded any of the items, in all sections at once
+    history_users = get_history_users_by_section(
+        related_items,
+        user_ids,
+        company_ids,
+        sections,
+        'download'
+    )
 
     def _get_users(section):
         """Get the list of users who have downloaded or bookmarked the items"""
-        # Get users who have downloaded any of the items
-        user_list = get_history_users(
-            related_items,
-            user_ids,
-            company_ids,
-            section,
-            'download'
-        )
+        user_list = list(history_users[section])
 
         if is_text and section != 'agenda':
             # Add users who have bookmarked any of the items
@@ -646,7 +968,7 @@ def notify_user_matches(item, users_dict, companies_dict, user_ids, company_ids)
             if user_id not in users_processed
         ]
 
-        users_processed.extend(user_list)
+        users_processed.update(user_list)
 
         # Remove duplicates and return the list
         return list(set(user_list))
@@ -655,10 +977,12 @@ def notify_user_matches(item, users_dict, companies_dict, user_ids, company_ids)
         if not users_ids:
             return
 
-        app.data.insert('notifications', [
+        counts = superdesk.get_resource_service('notifications').upsert([
             {'item': item['_id'], 'user': user}
             for user in users_ids
         ])
+        logger.info('Notifications for item %s in %s: %d inserted, %d refreshed',
+                    item['_id'], section, counts['inserted'], counts['refreshed'])
 
         push_notification(
             'history_matches',
@@ -679,30 +1003,30 @@ def notify_user_matches(item, users_dict, companies_dict, user_ids, company_ids)
     _send_notification('wire', _get_users('wire'))
 
     # Next iterate over the registered sections (excluding wire and api)
-    for section_id in [
-        section['_id']
-        for section in app.sections
-        if section['_id'] != 'wire' and section['group'] not in ['api', 'monitoring']
-    ]:
+    for section_id in sections[1:]:
         # Add the users for those sections and send the notification
         _send_notification(section_id, _get_users(section_id))
 
 
 def send_user_notification_emails(item, user_matches, users, section):
-    for user_id in user_matches:
-        user = users.get(str(user_id))
-        if item.get('pubstatus', item.get('state')) in ['canceled', 'cancelled']:
-            send_item_killed_notification_email(user, item=item)
-        else:
-            if user.get('receive_email'):
-                send_history_match_notification_email(user, item=item, section=section)
+    with bulk_emails():
+        for user_id in user_matches:
+            user = users.get(str(user_id))
+            if item.get('pubstatus', item.get('state')) in ['canceled', 'cancelled']:
+                send_item_killed_notification_email(user, item=item)
+            else:
+                if user.get('receive_email'):
+                    send_history_match_notification_email(user, item=item, section=section)
 
 
 def notify_wire_topic_matches(item, users_dict, companies_dict):
     topics = get_wire_notification_topics()
 
-    topic_matches = superdesk.get_resource_service('wire_search'). \
-        get_matching_topics(item['_id'], topics, users_dict, companies_dict)
+    if topics_percolator.is_enabled():
+        topic_matches = topics_percolator.get_matching_topics(item['_id'], topics, users_dict, companies_dict)
+    else:
+        topic_matches = superdesk.get_resource_service('wire_search'). \
+            get_matching_topics(item['_id'], topics, users_dict, companies_dict)
 
     if topic_matches:
         push_notification('topic_matches',
@@ -724,15 +1048,16 @@ def notify_agenda_topic_matches(item, users_dict):
 
 
 def send_topic_notification_emails(item, topics, topic_matches, users):
-    for topic in topics:
-        user = users.get(str(topic['user']))
-        if topic['_id'] in topic_matches and user and user.get('receive_email'):
-            send_new_item_notification_email(
-                user,
-                topic['label'],
-                item=item,
-                section=topic.get('topic_type') or 'wire'
-            )
+    with bulk_emails():
+        for topic in topics:
+            user = users.get(str(topic['user']))
+            if topic['_id'] in topic_matches and user and user.get('receive_email'):
+                send_new_item_notification_email(
+                    user,
+                    topic['label'],
+                    item=item,
+                    section=topic.get('topic_type') or 'wire'
+                )
 
 
 # keeping this for testing
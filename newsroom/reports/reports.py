@@ -16,6 +16,9 @@ from .content_activity import get_content_activity_report  # noqa
 from eve.utils import ParsedRequest
 from newsroom.news_api.api_tokens import API_TOKENS
 from newsroom.news_api.utils import format_report_results
+from newsroom.history import HISTORY_SEARCH_AFTER_TIEBREAKER
+from newsroom.search import get_search_after_sort, get_search_after_query, get_last_sort_values, \
+    encode_next_token, decode_next_token
 
 
 def get_company_saved_searches():
@@ -174,14 +177,20 @@ def get_subscriber_activity_report():
     if date_range.get('gt') or date_range.get('lt'):
         must_terms.append({"range": {"versioncreated": date_range}})
 
-    source['sort'] = [{'versioncreated': 'desc'}]
-    if len(must_terms) > 0:
-        source['query'] = {'bool': {'must': must_terms}}
-
+    # next pages are requested using ``next`` token from previous response
+    source['sort'] = get_search_after_sort([{'versioncreated': 'desc'}], HISTORY_SEARCH_AFTER_TIEBREAKER)
     source['size'] = 25
     source['from'] = int(args.get('from', 0))
     source['aggs'] = aggregations
 
+    if args.get('next'):
+        values = decode_next_token(args['next'], source['sort'])
+        must_terms.append(get_search_after_query(source['sort'], values))
+        source['from'] = 0
+
+    if len(must_terms) > 0:
+        source['query'] = {'bool': {'must': must_terms}}
+
     if source['from'] >= 1000:
         # https://www.elastic.co/guide/en/elasticsearch/guide/current/pagination.html#pagination
         return abort(400)
@@ -190,6 +199,7 @@ def get_subscriber_activity_report():
     results = superdesk.get_resource_service('history').fetch_history(source, args.get('export'))
     docs = results['items']
     hits = results['hits']
+    next_values = get_last_sort_values(hits, source['sort']) if len(docs) >= source['size'] else None
 
     # Enhance the results
     wire_ids = []
@@ -242,7 +252,8 @@ def get_subscriber_activity_report():
         results = {
             'results': docs,
             'name': gettext('SubscriberActivity'),
-            'aggregations': hits.get('aggregations')
+            'aggregations': hits.get('aggregations'),
+            '_next': encode_next_token(next_values) if next_values else None,
         }
         return results
     else:
@@ -284,9 +295,8 @@ def get_company_api_usage():
     source = {}
     must_terms = [{"range": {"created": date_range}}]
     source['query'] = {'bool': {'must': must_terms}}
-    source['sort'] = [{'created': 'desc'}]
-    source['size'] = 200
-    source['from'] = int(args.get('from', 0))
+    # report is built from aggregations only, so there are no hits to paginate
+    source['size'] = 0
     source['aggs'] = {"items": {
       "aggs": {
         "endpoints": {
@@ -307,10 +317,6 @@ def get_company_api_usage():
     req = ParsedRequest()
     req.args = {'source': json.dumps(source)}
 
-    if source['from'] >= 1000:
-        # https://www.elastic.co/guide/en/elasticsearch/guide/current/pagination.html#pagination
-        return abort(400)
-
     unique_endpoints = []
     search_result = superdesk.get_resource_service('api_audit').get(req, None)
     results = format_report_results(search_result, unique_endpoints, companies)
@@ -1,6 +1,13 @@
+import base64
+import binascii
+import hashlib
+import threading
+from copy import deepcopy
+from contextlib import contextmanager
 from flask import current_app as app, json, abort
 from flask_babel import gettext
 from eve.utils import ParsedRequest
+from eve_elastic.elastic import ElasticCursor
 import logging
 
 from superdesk import get_resource_service
@@ -12,10 +19,160 @@ from newsroom.auth import get_user
 from newsroom.companies import get_user_company
 from newsroom.settings import get_setting
 from newsroom.template_filters import is_admin
-from newsroom.utils import get_local_date, get_end_date
+from newsroom.search_timings import SearchTimings
+from newsroom.utils import get_local_date, get_end_date, get_cache_version, bump_cache_version
 
 logger = logging.getLogger(__name__)
 
+#: Makes wire and agenda sort unique so it can be used for cursor pagination,
+#: not analyzed fields are sorted using doc values
+SEARCH_AFTER_TIEBREAKER = ('guid', )
+#: Elastic uses long min/max as sort value for items missing the sort field
+MISSING_SORT_VALUE = 2 ** 63 - 1
+
+#: identical searches running in this process
+search_flights = {}
+search_flights_lock = threading.Lock()
+#: search requests sent to elastic and shared with other identical searches in this process
+search_flight_stats = {'executed': 0, 'coalesced': 0}
+
+AGGREGATIONS_CACHE_KEY = 'search_aggregations:{}:{}:{}'
+#: Source keys not affecting aggregations
+AGGREGATIONS_CACHE_IGNORED_KEYS = ('sort', 'size', 'from', 'highlight')
+
+
+def use_filter_context():
+    return app.config.get('SEARCH_FILTER_CONTEXT', False)
+
+
+def get_search_flight_stats():
+    """Get number of searches sent to elastic and coalesced with identical running ones."""
+    return dict(search_flight_stats)
+
+
+class SearchFlight():
+    """Search request which can be shared by identical concurrent searches."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.waiters = 0
+        self.hits = None
+        self.docs = None
+
+    def get_cursor(self):
+        """Get copy of the results, so every request can modify these."""
+        return ElasticCursor(deepcopy(self.hits), deepcopy(self.docs))
+
+
+def get_aggregations_cache_name(datasource):
+    return 'search_aggregations_{}'.format(datasource)
+
+
+def bump_aggregations_version(datasource):
+    """Invalidate cached search aggregations for given source collection, eg. when new item is pushed.
+
+    :param datasource: source collection name like ``items`` or ``agenda``, it invalidates all search resources using it
+    """
+    bump_cache_version(get_aggregations_cache_name(datasource))
+
+
+def get_search_after_sort(sort, tiebreaker=SEARCH_AFTER_TIEBREAKER):
+    """Get sort for cursor pagination, with tiebreaker fields appended.
+
+    Returns ``None`` if given sort can't be used for it,
+    like when sorting by score or using sort options other than ``order``.
+
+    :param sort: list of elastic sort fields
+    :param tiebreaker: fields making the sort unique
+    """
+    if not isinstance(sort, list):
+        return None
+
+    search_after_sort = []
+    for sort_field in sort:
+        if not isinstance(sort_field, dict) or len(sort_field) != 1:
+            return None
+        field, order = next(iter(sort_field.items()))
+        if isinstance(order, dict):
+            if list(order.keys()) != ['order']:
+                return None
+            order = order['order']
+        if field == '_score' or order not in ('asc', 'desc'):
+            return None
+        if field not in tiebreaker:
+            search_after_sort.append({field: order})
+
+    search_after_sort.extend({field: 'asc'} for field in tiebreaker)
+    return search_after_sort
+
+
+def get_search_after_query(sort, values):
+    """Get query matching items sorted after given sort values.
+
+    Elasticsearch we use has no ``search_after``, so it's done using range queries.
+
+    :param sort: sort from :func:`get_search_after_sort`
+    :param values: sort values of the last item
+    """
+    should = []
+    for index, sort_field in enumerate(sort):
+        must = []
+        for (previous, value) in zip(sort[:index], values):
+            must.append({'range': {next(iter(previous)): {'gte': value, 'lte': value}}})
+        field, order = next(iter(sort_field.items()))
+        must.append({'range': {field: {'lt' if order == 'desc' else 'gt': values[index]}}})
+        should.append({'bool': {'must': must}})
+    return {'bool': {'should': should, 'minimum_should_match': 1}}
+
+
+def get_last_sort_values(hits, sort):
+    """Get sort values of the last hit if it can be used for next page.
+
+    :param hits: elastic response
+    :param sort: sort from :func:`get_search_after_sort`
+    """
+    last_hits = (hits.get('hits') or {}).get('hits') or []
+    if not sort or not last_hits:
+        return None
+
+    values = last_hits[-1].get('sort')
+    if not values or len(values) != len(sort):
+        return None
+
+    for value in values:
+        if value is None or (isinstance(value, int) and abs(value) >= MISSING_SORT_VALUE):
+            return None
+
+    return values
+
+
+def encode_next_token(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+
+def decode_next_token(token, sort):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token.encode('ascii')).decode('utf-8'))
+    except (ValueError, TypeError, binascii.Error):
+        values = None
+
+    if not isinstance(values, list) or len(values) != len(sort):
+        abort(400, gettext('Invalid next page token'))
+
+    return values
+
+
+class SearchCursor(ElasticCursor):
+    """Search results cursor adding next page token to the response."""
+
+    def __init__(self, cursor, next_token):
+        super().__init__(cursor.hits, cursor.docs)
+        self.next_token = next_token
+
+    def extra(self, response):
+        super().extra(response)
+        response['_next'] = self.next_token
+
 
 def query_string(query, default_operator='AND'):
     return {
@@ -47,6 +204,8 @@ class SearchQuery(object):
 
         self.aggs = None
         self.source = {}
+        self.search_after_sort = None
+        self.timings = SearchTimings(None)
         self.query = {
             'bool': {
                 'must': [],
@@ -62,19 +221,128 @@ class BaseSearchService(Service):
     limit_days_setting = 'wire_time_limit_days'
     default_sort = [{'versioncreated': 'desc'}]
     default_page_size = 25
+    #: Use cursor pagination, responses contain ``_next`` token to use as ``next`` param
+    search_after = True
 
     def get(self, req, lookup):
         search = SearchQuery()
-        self.prefill_search_query(search, req, lookup)
-        self.validate_request(search)
-        self.apply_filters(search)
-        self.gen_source_from_search(search)
+        search.timings = SearchTimings(self.section)
+        with search.timings.stage('prefill'):
+            self.prefill_search_query(search, req, lookup)
+            self.validate_request(search)
+        with search.timings.stage('filters'):
+            self.apply_filters(search)
+            self.gen_source_from_search(search)
+
+        aggregations_key = self.get_aggregations_cache_key(search)
+        aggregations = app.cache.get(aggregations_key) if aggregations_key else None
+        if aggregations is not None:
+            search.source.pop('aggs')
 
         internal_req = self.get_internal_request(search)
-        return self.internal_get(internal_req, search.lookup)
+        with search.timings.stage('elastic'):
+            cursor = self.internal_get(internal_req, search.lookup)
+        search.timings.set_elastic(cursor.hits)
+        search.timings.finish(search.source)
+
+        if aggregations_key and cursor.hits is not cursor.no_hits:
+            if aggregations is not None:
+                cursor.hits['aggregations'] = aggregations
+            elif cursor.hits.get('aggregations') is not None:
+                app.cache.set(aggregations_key, cursor.hits['aggregations'],
+                              timeout=app.config['SEARCH_AGGREGATIONS_CACHE_TIMEOUT'])
+
+        if search.search_after_sort and len(cursor.docs) >= search.source['size']:
+            values = get_last_sort_values(cursor.hits, search.search_after_sort)
+            if values:
+                return SearchCursor(cursor, encode_next_token(values))
+
+        return cursor
 
     def internal_get(self, req, lookup):
-        return super().get(req, lookup)
+        """Run the search, coalescing identical concurrent searches.
+
+        While a search is running, identical searches wait for it and get
+        a copy of its results instead of sending the same request to elastic.
+        """
+        if not app.config.get('SEARCH_COALESCING'):
+            return super().get(req, lookup)
+
+        key = self.get_search_flight_key(req, lookup)
+        with search_flights_lock:
+            flight = search_flights.get(key)
+            running = flight is not None
+            if running:
+                flight.waiters += 1
+                search_flight_stats['coalesced'] += 1
+            else:
+                flight = search_flights[key] = SearchFlight()
+                search_flight_stats['executed'] += 1
+
+        if running:
+            if flight.done.wait(app.config['SEARCH_COALESCING_TIMEOUT']) and flight.hits is not None:
+                return flight.get_cursor()
+            logger.warning('Coalesced search failed or timed out, running it again')
+            return super().get(req, lookup)
+
+        cursor = None
+        try:
+            cursor = super().get(req, lookup)
+            return cursor
+        finally:
+            with search_flights_lock:
+                search_flights.pop(key, None)
+                waiters = flight.waiters
+            if cursor is not None and waiters:
+                # copy the results only if there is someone waiting, caller can modify the cursor
+                flight.hits = deepcopy(cursor.hits)
+                flight.docs = deepcopy(cursor.docs)
+            flight.done.set()
+
+    def get_search_flight_key(self, req, lookup):
+        """Get key identifying the search request
+
+        :param ParsedRequest req: internal request with elastic source and projections
+        :param dict lookup: search lookup
+        """
+        search = json.dumps({
+            'datasource': self.datasource,
+            'args': req.args,
+            'lookup': lookup,
+        }, sort_keys=True)
+        return hashlib.sha1(search.encode('utf-8')).hexdigest()
+
+    def internal_msearch(self, sources):
+        """Run multiple searches using single multi search request.
+
+        Every source is filtered same way like using :meth:`internal_get`.
+
+        :param sources: list of elastic sources
+        :return: list of cursors in the order of sources
+        """
+        if not sources:
+            return []
+
+        elastic = app.data.elastic
+        args = elastic._es_args(self.datasource)
+        elastic_filter = app.config['SOURCES'][self.datasource].get('elastic_filter')
+        body = []
+        for source in sources:
+            query = dict(source)
+            query['query'] = {'filtered': {'query': source.get('query') or {'match_all': {}}}}
+            if elastic_filter:
+                query['query']['filtered']['filter'] = {'and': [elastic_filter]}
+            body.append({'index': args['index'], 'type': args['doc_type']})
+            body.append(query)
+
+        responses = elastic.elastic(self.datasource).msearch(body=body)['responses']
+        cursors = []
+        for response in responses:
+            if response.get('error'):
+                logger.error('Multi search failed for %s: %s', self.datasource, response['error'])
+                response = {}
+            cursors.append(elastic._parse_hits(response, self.datasource))
+        return cursors
 
     # Overridable internal methods
     def prefill_search_query(self, search, req=None, lookup=None):
@@ -88,11 +356,15 @@ class BaseSearchService(Service):
         self.prefill_search_args(search, req)
         self.prefill_search_lookup(search, lookup)
         self.prefill_search_page(search)
-        self.prefill_search_user(search)
-        self.prefill_search_company(search)
+        with search.timings.stage('prefill_user'):
+            self.prefill_search_user(search)
+        with search.timings.stage('prefill_company'):
+            self.prefill_search_company(search)
         self.prefill_search_section(search)
-        self.prefill_search_navigation(search)
-        self.prefill_search_products(search)
+        with search.timings.stage('prefill_navigation'):
+            self.prefill_search_navigation(search)
+        with search.timings.stage('prefill_products'):
+            self.prefill_search_products(search)
         self.prefill_search_items(search)
         self.prefill_search_highlights(search, req)
 
@@ -101,15 +373,43 @@ class BaseSearchService(Service):
 
         :param SearchQuery search: the search query instance
         """
-        self.apply_section_filter(search)
-        self.apply_company_filter(search)
-        self.apply_time_limit_filter(search)
-        self.apply_products_filter(search)
+        with self.permissions_filter(search):
+            self.apply_section_filter(search)
+            self.apply_company_filter(search)
+            self.apply_time_limit_filter(search)
+            self.apply_products_filter(search)
         self.apply_request_filter(search)
 
         if len(search.query['bool'].get('should', [])):
             search.query['bool']['minimum_should_match'] = 1
 
+    @contextmanager
+    def permissions_filter(self, search):
+        """ Collect permission clauses added within the block into filter context
+
+        Clauses are added to a separate bool query which is appended to ``bool.filter``,
+        so these are not scored and elastic can cache them.
+        Does nothing unless ``SEARCH_FILTER_CONTEXT`` is enabled.
+
+        :param SearchQuery search: the search query instance
+        """
+        if not use_filter_context():
+            yield
+            return
+
+        query = search.query
+        search.query = SearchQuery().query
+        try:
+            yield
+        finally:
+            permissions = search.query
+            search.query = query
+
+        if permissions['bool']['should']:
+            permissions['bool']['minimum_should_match'] = 1
+        if any(permissions['bool'].values()):
+            query['bool'].setdefault('filter', []).append(permissions)
+
     def gen_source_from_search(self, search):
         """ Generate the eve source object from the search query instance
 
@@ -121,16 +421,63 @@ class BaseSearchService(Service):
         search.source['size'] = search.args.get('size') or 25
         search.source['from'] = int(search.args.get('from') or 0)
 
+        if self.search_after:
+            self.apply_search_after(search)
+
         if search.source['from'] >= 1000:
             # https://www.elastic.co/guide/en/elasticsearch/guide/current/pagination.html#pagination
             return abort(400, gettext('Page limit exceeded'))
 
-        if not search.source['from'] and search.args.get('aggs', True):
+        if not search.source['from'] and not search.args.get('next') and search.args.get('aggs', True):
             search.source['aggs'] = self.get_aggregations()
 
         if search.highlight:
             search.source['highlight'] = search.highlight
 
+    def apply_search_after(self, search):
+        """ Use cursor pagination if requested and sort allows it
+
+        Client asks for it using ``cursor`` param and next page is requested
+        using ``next`` token from previous response instead of ``from``,
+        so deep pages are as fast as the first one.
+        Tiebreaker sort is only added for these requests.
+
+        :param SearchQuery search: The search query instance
+        """
+        if not search.args.get('cursor') and not search.args.get('next'):
+            return
+
+        search.search_after_sort = get_search_after_sort(search.source['sort'])
+        if search.search_after_sort:
+            search.source['sort'] = search.search_after_sort
+
+        if search.args.get('next'):
+            if not search.search_after_sort:
+                abort(400, gettext('Next page token can not be used with this sort'))
+            values = decode_next_token(search.args['next'], search.search_after_sort)
+            search.query['bool']['must'].append(get_search_after_query(search.search_after_sort, values))
+            search.source['from'] = 0
+
+    def get_aggregations_cache_key(self, search):
+        """ Get cache key for search aggregations
+
+        Aggregations are cached for the same query and filters,
+        so these are computed only once for all users with same permissions.
+        Returns ``None`` if aggregations should not be cached.
+
+        :param SearchQuery search: The search query instance
+        """
+        if not app.config.get('SEARCH_AGGREGATIONS_CACHE_TIMEOUT') or not search.source.get('aggs') or \
+                search.args.get('bookmarks'):
+            return None
+
+        source = {key: value for key, value in search.source.items() if key not in AGGREGATIONS_CACHE_IGNORED_KEYS}
+        digest = hashlib.sha1(json.dumps(source, sort_keys=True).encode('utf-8')).hexdigest()
+        # version is bumped per source collection (eg. ``items``) shared by search resources
+        source_name = app.config['SOURCES'].get(self.datasource, {}).get('source', self.datasource)
+        version = get_cache_version(get_aggregations_cache_name(source_name))
+        return AGGREGATIONS_CACHE_KEY.format(self.datasource, version, digest)
+
     def get_internal_request(self, search):
         """ Creates an eve internal request object
 
@@ -0,0 +1,131 @@
+"""Timing breakdown of search requests.
+
+Every search records how long its stages took (prefill, filters, elastic)
+together with elastic ``took`` and network time. Timings are:
+
+- added as ``Server-Timing`` response header in debug mode,
+- logged with the generated query if the search is slower than ``SEARCH_SLOW_QUERY_TIME``,
+- aggregated into histograms per section and stage for the process.
+"""
+
+import time
+import logging
+import threading
+
+from contextlib import contextmanager
+from flask import current_app as app, json, g, has_request_context
+
+logger = logging.getLogger(__name__)
+
+#: histogram buckets upper bounds in ms
+HISTOGRAM_BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf'))
+
+#: search timing histograms for this process, ``(section, stage)`` - counts per bucket
+histograms = {}
+histograms_lock = threading.Lock()
+
+
+class SearchTimings():
+    """Timings of a single search.
+
+    :param section: search section
+    """
+
+    def __init__(self, section):
+        self.section = section
+        self.started = time.time()
+        self.finished = None
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        """Measure time spent in the block."""
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add(name, time.time() - start)
+
+    def add(self, name, duration):
+        """Add stage duration in seconds."""
+        self.stages[name] = self.stages.get(name, 0) + duration
+
+    def set_elastic(self, hits):
+        """Split time spent in elastic request into elastic ``took`` and network time.
+
+        :param hits: elastic response
+        """
+        took = hits.get('took')
+        if took is not None and 'elastic' in self.stages:
+            self.stages['elastic_took'] = took / 1000
+            self.stages['elastic_network'] = max(0, self.stages['elastic'] - took / 1000)
+
+    def finish(self, source=None):
+        """Record the timings once search is done.
+
+        :param source: elastic source used for the search
+        """
+        self.finished = time.time()
+        self.stages['total'] = self.finished - self.started
+        add_to_histograms(self.section, self.stages)
+
+        if has_request_context():
+            g.setdefault('search_timings', []).append(self)
+
+        slow_time = app.config.get('SEARCH_SLOW_QUERY_TIME')
+        if slow_time and self.stages['total'] >= slow_time:
+            logger.warning('Slow search %s', json.dumps({
+                'section': self.section,
+                'timings': self.get_ms(),
+                'query': source,
+            }))
+
+    def get_ms(self):
+        return {name: round(duration * 1000, 2) for name, duration in self.stages.items()}
+
+
+def add_to_histograms(section, stages):
+    with histograms_lock:
+        for name, duration in stages.items():
+            histogram = histograms.setdefault((section, name), [0] * len(HISTOGRAM_BUCKETS))
+            ms = duration * 1000
+            for index, bucket in enumerate(HISTOGRAM_BUCKETS):
+                if ms <= bucket:
+                    histogram[index] += 1
+                    break
+
+
+def get_histograms():
+    """Get search timing histograms for this process.
+
+    :return: dict ``{section: {stage: {bucket: count}}}`` with bucket upper bounds in ms
+    """
+    with histograms_lock:
+        data = {}
+        for (section, name), counts in histograms.items():
+            data.setdefault(section, {})[name] = dict(zip([str(bucket) for bucket in HISTOGRAM_BUCKETS], counts))
+        return data
+
+
+def add_timings_header(response):
+    """Record post processing time of searches done in the request.
+
+    Time between the end of the search and the response (eg. ``on_fetched`` hooks
+    and serialization) is added as ``post_processing`` stage.
+    In debug mode all the timings are added to ``Server-Timing`` response header.
+    """
+    timings = g.pop('search_timings', None)
+    if not timings:
+        return response
+
+    now = time.time()
+    metrics = []
+    for index, search_timings in enumerate(timings):
+        search_timings.add('post_processing', now - search_timings.finished)
+        add_to_histograms(search_timings.section, {'post_processing': search_timings.stages['post_processing']})
+        for name, duration in search_timings.get_ms().items():
+            metrics.append('{}-{}-{};dur={}'.format(search_timings.section, index, name, duration))
+
+    if app.config.get('DEBUG'):
+        response.headers.add('Server-Timing', ', '.join(metrics))
+    return response
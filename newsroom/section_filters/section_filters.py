@@ -1,6 +1,10 @@
 import newsroom
 import superdesk
 from newsroom.search import query_string
+from newsroom.topics.percolator import queue_topics_update
+from newsroom.utils import get_versioned_cache, bump_cache_version
+
+SECTION_FILTERS_CACHE = 'section_filters'
 
 
 class SectionFiltersResource(newsroom.Resource):
@@ -47,28 +51,34 @@ class SectionFiltersResource(newsroom.Resource):
 
 
 class SectionFiltersService(newsroom.Service):
+    def on_created(self, docs):
+        super().on_created(docs)
+        queue_topics_update(all_topics=True)
+        bump_section_filters_version()
+
+    def on_updated(self, updates, original):
+        super().on_updated(updates, original)
+        queue_topics_update(all_topics=True)
+        bump_section_filters_version()
+
+    def on_deleted(self, doc):
+        super().on_deleted(doc)
+        queue_topics_update(all_topics=True)
+        bump_section_filters_version()
+
     def get_section_filters(self, filter_type):
         """Get the list of section filter by filter type
 
         :param filter_type: Type of filter
         """
-        lookup = {'is_enabled': True, 'filter_type': filter_type}
-        section_filters = list(superdesk.get_resource_service('section_filters').get(req=None, lookup=lookup))
-        return section_filters
+        return list(get_section_filters_snapshot()['filters'].get(filter_type) or [])
 
     def get_section_filters_dict(self):
         """Get the list of all section filters
 
         """
-        lookup = {'is_enabled': True}
-        section_filters = list(superdesk.get_resource_service('section_filters').get(req=None, lookup=lookup))
-        filters = {}
-        for f in section_filters:
-            if not filters.get(f.get('filter_type')):
-                filters[f.get('filter_type')] = []
-            filters[f.get('filter_type')].append(f)
-
-        return filters
+        return {filter_type: list(filters)
+                for filter_type, filters in get_section_filters_snapshot()['filters'].items()}
 
     def apply_section_filter(self, query, product_type, filters=None):
         """Get the list of base products for product type
@@ -78,13 +88,42 @@ class SectionFiltersService(newsroom.Service):
         :param filters: filters for each section
         """
         if not filters:
-            section_filters = self.get_section_filters(product_type)
-        else:
-            section_filters = filters.get(product_type)
+            query['bool']['must'].extend(get_section_filters_snapshot()['clauses'].get(product_type) or [])
+            return
 
+        section_filters = filters.get(product_type)
         if not section_filters:
             return
 
         for f in section_filters:
             if f.get('query'):
                 query['bool']['must'].append(query_string(f.get('query')))
+
+
+def bump_section_filters_version():
+    """Invalidate enabled section filters snapshot in all processes."""
+    bump_cache_version(SECTION_FILTERS_CACHE)
+
+
+def get_section_filters_snapshot():
+    """Get enabled section filters and their query clauses grouped by filter type.
+
+    Query clauses are shared, so these must not be modified.
+    """
+    return get_versioned_cache(SECTION_FILTERS_CACHE, load_section_filters)
+
+
+def load_section_filters():
+    lookup = {'is_enabled': True}
+    section_filters = superdesk.get_resource_service('section_filters').get(req=None, lookup=lookup)
+    filters = {}
+    clauses = {}
+    for f in section_filters:
+        filters.setdefault(f.get('filter_type'), []).append(f)
+        if f.get('query'):
+            clauses.setdefault(f.get('filter_type'), []).append(query_string(f.get('query')))
+
+    return {
+        'filters': filters,
+        'clauses': clauses,
+    }
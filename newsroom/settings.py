@@ -7,7 +7,8 @@ import bleach
 import html
 from flask_babel import gettext, lazy_gettext
 from superdesk.utc import utcnow
-from newsroom.utils import get_json_or_400, set_version_creator, is_safe_string
+from newsroom.utils import get_json_or_400, set_version_creator, is_safe_string, get_versioned_cache, \
+    bump_cache_version
 from newsroom.template_filters import newsroom_config
 from newsroom.decorator import admin_only, account_manager_only
 
@@ -15,6 +16,8 @@ from newsroom.decorator import admin_only, account_manager_only
 blueprint = flask.Blueprint('settings', __name__)
 
 GENERAL_SETTINGS_LOOKUP = {'_id': 'general_settings'}
+SETTINGS_CACHE = 'general_settings'
+AUDIT_FIELDS = ('_updated', 'version_creator')
 
 
 def get_settings_collection():
@@ -45,6 +48,7 @@ def update_values():
 
     get_settings_collection().update_one(GENERAL_SETTINGS_LOOKUP, {'$set': updates}, upsert=True)
     flask.g.settings = None  # reset cache on update
+    bump_cache_version(SETTINGS_CACHE)
     return flask.jsonify(updates)
 
 
@@ -55,21 +59,29 @@ def get_initial_data(setting_key=None):
 
 def get_setting(setting_key=None, include_audit=False):
     if not getattr(flask.g, 'settings', None):
-        values = get_settings_collection().find_one(GENERAL_SETTINGS_LOOKUP)
-        settings = copy.deepcopy(flask.current_app._general_settings)
-        if values:
-            for key, val in values.get('values', {}).items():
-                if val and settings.get(key):
-                    settings[key]['value'] = html.unescape(bleach.clean(val, strip=True))
-            if include_audit:
-                settings['_updated'] = values.get('_updated')
-                settings['version_creator'] = values.get('version_creator')
-
-        flask.g.settings = settings
+        flask.g.settings = get_versioned_cache(SETTINGS_CACHE, load_settings)
     if setting_key:
         setting_dict = flask.g.settings.get(setting_key) or {}
         return setting_dict.get('value', setting_dict.get('default'))
-    return flask.g.settings
+    if include_audit:
+        return flask.g.settings
+    return {key: value for key, value in flask.g.settings.items() if key not in AUDIT_FIELDS}
+
+
+def load_settings():
+    """Load general settings with values already sanitized.
+
+    It's shared by all requests in the process until settings are updated.
+    """
+    values = get_settings_collection().find_one(GENERAL_SETTINGS_LOOKUP)
+    settings = copy.deepcopy(flask.current_app._general_settings)
+    if values:
+        for key, val in values.get('values', {}).items():
+            if val and settings.get(key):
+                settings[key]['value'] = html.unescape(bleach.clean(val, strip=True))
+        for key in AUDIT_FIELDS:
+            settings[key] = values.get(key)
+    return settings
 
 
 def get_client_config():
@@ -0,0 +1,232 @@
+"""Elasticsearch percolator for wire topics.
+
+Topic queries are stored in the percolator with all the permissions of the topic
+user applied (products, section filters, company type and time limit filters),
+so matching a new item against all the topics is a single percolate request.
+
+Stored queries must be updated whenever a topic, user, company, product or section
+filter changes, services call :func:`queue_topics_update` for that.
+
+Topics using relative dates (eg. ``now/d``) in the ``created`` filter can't be stored
+because the dates would be resolved only once, these are matched using
+:meth:`newsroom.wire.search.WireSearchService.get_matching_topics` as before.
+"""
+
+import logging
+
+from bson import ObjectId
+from elasticsearch import helpers
+from flask import current_app as app
+from superdesk import get_resource_service
+
+from newsroom.celery_app import celery
+from newsroom.utils import get_user_dict, get_company_dict
+
+logger = logging.getLogger(__name__)
+
+PERCOLATOR_TYPE = '.percolator'
+PERCOLATOR_ID_PREFIX = 'topic_'
+
+
+def is_enabled():
+    return app.config.get('WIRE_TOPICS_PERCOLATOR', False)
+
+
+def get_index():
+    return app.config['CONTENTAPI_ELASTICSEARCH_INDEX']
+
+
+def get_percolator_id(topic_id):
+    return '{}{}'.format(PERCOLATOR_ID_PREFIX, topic_id)
+
+
+def is_wire_notification_topic(topic):
+    return bool(topic.get('notifications')) and topic.get('topic_type') == 'wire'
+
+
+def is_relative_date(value):
+    return isinstance(value, str) and value.startswith('now')
+
+
+def can_percolate(topic):
+    """Test if topic query is not changing in time, so it can be stored."""
+    created = topic.get('created') or {}
+    return not is_relative_date(created.get('from')) and not is_relative_date(created.get('to'))
+
+
+def get_wire_topics(lookup=None):
+    query = {'topic_type': 'wire'}
+    if lookup:
+        query.update(lookup)
+    return list(get_resource_service('topics').get(req=None, lookup=query))
+
+
+def index_topics(topics, users=None, companies=None, section_filters=None):
+    """Store queries for given topics in percolator.
+
+    Topics which should not get notifications are removed from percolator.
+
+    :param topics: list of topics
+    :param users: user_id, user dictionary
+    :param companies: company_id, company dictionary
+    :param section_filters: section filters dictionary
+    """
+    if users is None:
+        users = get_user_dict()
+    if companies is None:
+        companies = get_company_dict()
+    if section_filters is None:
+        section_filters = get_resource_service('section_filters').get_section_filters_dict()
+
+    service = get_resource_service('wire_search')
+    actions = []
+    for topic in topics:
+        query = None
+        if is_wire_notification_topic(topic) and can_percolate(topic):
+            query = service.get_topic_query(topic, users, companies, section_filters)
+
+        action = {
+            '_index': get_index(),
+            '_type': PERCOLATOR_TYPE,
+            '_id': get_percolator_id(topic['_id']),
+        }
+
+        if query is None:
+            action['_op_type'] = 'delete'
+        else:
+            action['_op_type'] = 'index'
+            action['_source'] = {'query': query, 'topic': str(topic['_id']), 'user': str(topic['user'])}
+
+        actions.append(action)
+
+    if actions:
+        # deleting missing percolators is reported as an error, it can be ignored
+        helpers.bulk(app.data.elastic.es, actions, raise_on_error=False, refresh=True)
+
+
+def delete_topics(topic_ids):
+    actions = [{
+        '_op_type': 'delete',
+        '_index': get_index(),
+        '_type': PERCOLATOR_TYPE,
+        '_id': get_percolator_id(topic_id),
+    } for topic_id in topic_ids]
+
+    if actions:
+        helpers.bulk(app.data.elastic.es, actions, raise_on_error=False, refresh=True)
+
+
+def rebuild():
+    """Store all wire notification topics again and remove the ones which are gone.
+
+    New queries are indexed before removing anything so items pushed meanwhile
+    are still matched against stored topics.
+
+    :return: number of stored topics
+    """
+    stored = helpers.scan(app.data.elastic.es, index=get_index(), doc_type=PERCOLATOR_TYPE,
+                          query={'query': {'match_all': {}}}, _source=False)
+    stored_ids = {hit['_id'][len(PERCOLATOR_ID_PREFIX):] for hit in stored}
+
+    topics = get_wire_topics({'notifications': True})
+    index_topics(topics)
+    delete_topics(stored_ids - {str(topic['_id']) for topic in topics})
+    return len(topics)
+
+
+def get_percolated_topic_ids(item_id):
+    """Get ids of stored topics matching given item.
+
+    :param item_id: item id
+    """
+    results = app.data.elastic.es.percolate(index=get_index(), doc_type='items', id=item_id)
+    return {match['_id'][len(PERCOLATOR_ID_PREFIX):] for match in results.get('matches') or []}
+
+
+def get_matching_topics(item_id, topics, users, companies):
+    """Returns a list of topic ids matching to the given item_id
+
+    Same as :meth:`newsroom.wire.search.WireSearchService.get_matching_topics`
+    but using the percolator for stored topics.
+
+    :param item_id: item id to be tested against all topics
+    :param topics: list of topics
+    :param users: user_id, user dictionary
+    :param companies: company_id, company dictionary
+    """
+    percolated = get_percolated_topic_ids(item_id)
+    topic_matches = [topic['_id'] for topic in topics
+                     if str(topic['_id']) in percolated and users.get(str(topic['user']))]
+
+    other_topics = [topic for topic in topics if not can_percolate(topic)]
+    if other_topics:
+        topic_matches.extend(get_resource_service('wire_search').get_matching_topics(
+            item_id, other_topics, users, companies
+        ))
+
+    return topic_matches
+
+
+def check_consistency(item_ids):
+    """Compare percolator results with the filters aggregation for given items.
+
+    :param item_ids: list of item ids
+    :return: list of ``(item_id, missing, extra)`` tuples for items with differences
+    """
+    users = get_user_dict()
+    companies = get_company_dict()
+    topics = get_wire_topics({'notifications': True})
+    service = get_resource_service('wire_search')
+    differences = []
+
+    for item_id in item_ids:
+        expected = {str(_id) for _id in service.get_matching_topics(item_id, topics, users, companies)}
+        percolated = {str(_id) for _id in get_matching_topics(item_id, topics, users, companies)}
+        if expected != percolated:
+            differences.append((item_id, expected - percolated, percolated - expected))
+
+    return differences
+
+
+def queue_topics_update(topic_ids=None, user_ids=None, company_ids=None, all_topics=False):
+    """Queue update of stored topics affected by a change.
+
+    Does nothing unless ``WIRE_TOPICS_PERCOLATOR`` is enabled.
+    """
+    if not is_enabled():
+        return
+
+    _update_topics.apply_async(kwargs={
+        'topic_ids': [str(_id) for _id in topic_ids or []],
+        'user_ids': [str(_id) for _id in user_ids or []],
+        'company_ids': [str(_id) for _id in company_ids or []],
+        'all_topics': all_topics,
+    })
+
+
+@celery.task(soft_time_limit=600)
+def _update_topics(topic_ids=None, user_ids=None, company_ids=None, all_topics=False):
+    if all_topics:
+        rebuild()
+        return
+
+    user_ids = [ObjectId(_id) for _id in user_ids or []]
+    if company_ids:
+        users = get_resource_service('users').get(
+            req=None,
+            lookup={'company': {'$in': [ObjectId(_id) for _id in company_ids]}}
+        )
+        user_ids.extend(user['_id'] for user in users)
+
+    topics = []
+    if user_ids:
+        topics.extend(get_wire_topics({'user': {'$in': user_ids}}))
+
+    if topic_ids:
+        topic_ids = [ObjectId(_id) for _id in topic_ids]
+        topics.extend(get_wire_topics({'_id': {'$in': topic_ids}}))
+        # topics which are gone or changed type must be removed
+        found = {topic['_id'] for topic in topics}
+        delete_topics([_id for _id in topic_ids if _id not in found])
+
+    index_topics(topics)
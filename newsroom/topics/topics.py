@@ -2,6 +2,8 @@
 import newsroom
 import superdesk
 
+from newsroom.topics.percolator import queue_topics_update
+
 
 class TopicsResource(newsroom.Resource):
     url = 'users/<regex("[a-f0-9]{24}"):user>/topics'
@@ -25,7 +27,17 @@ class TopicsResource(newsroom.Resource):
 
 
 class TopicsService(newsroom.Service):
-    pass
+    def on_created(self, docs):
+        super().on_created(docs)
+        queue_topics_update(topic_ids=[doc['_id'] for doc in docs])
+
+    def on_updated(self, updates, original):
+        super().on_updated(updates, original)
+        queue_topics_update(topic_ids=[original['_id']])
+
+    def on_deleted(self, doc):
+        super().on_deleted(doc)
+        queue_topics_update(topic_ids=[doc['_id']])
 
 
 def get_user_topics(user_id):
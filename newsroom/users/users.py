@@ -5,7 +5,8 @@ import newsroom
 from content_api import MONGO_PREFIX
 from superdesk.utils import is_hashed, get_hash
 from newsroom.auth import get_user_id
-from newsroom.utils import set_original_creator, set_version_creator
+from newsroom.utils import set_original_creator, set_version_creator, bump_directory_version
+from newsroom.topics.percolator import queue_topics_update
 
 
 class UsersResource(newsroom.Resource):
@@ -119,6 +120,10 @@ class UsersService(newsroom.Service):
             if doc.get('password', None) and not is_hashed(doc.get('password')):
                 doc['password'] = self._get_password_hash(doc['password'])
 
+    def on_created(self, docs):
+        super().on_created(docs)
+        bump_directory_version()
+
     def on_update(self, updates, original):
         set_version_creator(updates)
         if 'password' in updates:
@@ -129,6 +134,11 @@ class UsersService(newsroom.Service):
         if updates.get('locale') and original['_id'] == get_user_id() and updates['locale'] != original.get('locale'):
             session['locale'] = updates['locale']
 
+        if any(key in updates for key in ('company', 'is_enabled', 'user_type')):
+            queue_topics_update(user_ids=[original['_id']])
+
+        bump_directory_version()
+
     def _get_password_hash(self, password):
         return get_hash(password, app.config.get('BCRYPT_GENSALT_WORK_FACTOR', 12))
 
@@ -144,3 +154,5 @@ class UsersService(newsroom.Service):
 
     def on_deleted(self, doc):
         app.cache.delete(str(doc.get('_id')))
+        queue_topics_update(user_ids=[doc['_id']])
+        bump_directory_version()
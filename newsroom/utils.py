@@ -1,3 +1,4 @@
+import time
 import superdesk
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
@@ -16,10 +17,15 @@ from newsroom.template_filters import time_short, parse_date as parse_short_date
 from newsroom.auth import get_user_id
 from unicodedata import category
 from html import unescape
+from types import MappingProxyType
 
 
 DAY_IN_MINUTES = 24 * 60 - 1
 
+VERSIONED_CACHE_EXTENSION = 'newsroom_versioned_cache'
+DIRECTORY_CACHE = 'directory'
+DIRECTORY_EXCLUDED_FIELDS = ('password', 'token', 'token_expiry_date', 'signup_details')
+
 # A whitelist of the characters allowed in the Telephone and mobile fields
 PHONE_REGEX = r"^[0-9-+\s()#]+$"
 
@@ -91,20 +97,33 @@ def get_entity_or_404(_id, resource):
 
 
 def get_entities_elastic_or_mongo_or_404(_ids, resource):
-    '''Finds item in elastic search as fist preference. If not configured, finds from mongo'''
+    '''Finds items in elastic search as fist preference. If not configured, finds from mongo
+
+    Items are fetched using single elastic mget and single mongo query for items missing in elastic.
+    Returned items are in the order of ids, if any item is missing aborts with 404.
+    '''
     elastic = app.data._search_backend(resource)
-    items = []
-    if elastic:
-        for id in _ids:
-            item = elastic.find_one('items', req=None, _id=id)
-            if not item:
-                item = get_entity_or_404(id, resource)
+    found = {}
+    if elastic and _ids:
+        found.update(get_elastic_entity_dict(elastic, 'items', _ids))
 
-            items.append(item)
-    else:
-        items = [get_entity_or_404(i, resource) for i in _ids]
+    missing = [_id for _id in _ids if _id not in found]
+    if missing:
+        items = superdesk.get_resource_service(resource).get_from_mongo(req=None, lookup={'_id': {'$in': missing}})
+        found.update(get_entity_dict(items))
 
-    return items
+    if any(_id not in found for _id in _ids):
+        abort(404)
+
+    return [found[_id] for _id in _ids]
+
+
+def get_elastic_entity_dict(elastic, resource, _ids):
+    '''Get items from elastic using single mget indexed by _id'''
+    args = elastic._es_args(resource)
+    response = elastic.elastic(resource).mget(body={'ids': list({str(_id) for _id in _ids})}, **args)
+    hits = [hit for hit in response.get('docs') or [] if hit.get('found')]
+    return get_entity_dict(elastic._parse_hits({'hits': {'hits': hits}}, resource))
 
 
 def get_json_or_400():
@@ -276,27 +295,87 @@ def is_account_enabled(user):
 
 def get_user_dict():
     """Get all active users indexed by _id."""
-    if 'user_dict' not in g or app.testing:
-        lookup = {'is_enabled': True}
-        all_users = query_resource('users', lookup=lookup)
-        companies = get_company_dict()
-        user_dict = {str(user['_id']): user for user in all_users
-                     if is_company_enabled(user, companies.get(user.get('company')))}
-        g.user_dict = user_dict
-    return g.user_dict
+    return get_directory()['users']
 
 
 def get_company_dict():
-    """Get all active companies indexed by _id.
+    """Get all active companies indexed by _id."""
+    return get_directory()['companies']
 
-    Must reload when testing because there it's using single context.
+
+def get_versioned_cache(name, load):
+    """Get data shared by all requests in the process.
+
+    Data are loaded using ``load`` function and reloaded once the version
+    stored in app cache is changed via :func:`bump_cache_version`
+    or when older than ``VERSIONED_CACHE_MAX_AGE``. Version change is only seen
+    by processes sharing the app cache (eg. redis), others get the changes
+    after max age. Within a request data are fetched once.
+
+    Must reload when testing because there it's using single context
+    and data is often inserted without using services.
+
+    :param name: cache name
+    :param load: function returning the data
     """
-    if 'company_dict' not in g or app.testing:
-        lookup = {'is_enabled': True}
-        all_companies = list(query_resource('companies', lookup=lookup))
-        g.company_dict = {str(company['_id']): company for company in all_companies
-                          if is_company_enabled({'company': company['_id']}, company)}
-    return g.company_dict
+    if app.testing:
+        return load()
+
+    request_cache = g.setdefault('versioned_cache', {})
+    if name not in request_cache:
+        version = get_cache_version(name)
+        caches = app.extensions.setdefault(VERSIONED_CACHE_EXTENSION, {})
+        cached = caches.get(name)
+        now = time.monotonic()
+        if not cached or cached[0] != version or now - cached[1] >= app.config.get('VERSIONED_CACHE_MAX_AGE', 60):
+            cached = (version, now, load())
+            caches[name] = cached
+        request_cache[name] = cached[2]
+    return request_cache[name]
+
+
+def get_cache_version(name):
+    version = app.cache.get('{}_version'.format(name))
+    if not version:
+        version = bump_cache_version(name)
+    return version
+
+
+def bump_cache_version(name):
+    """Invalidate data cached using :func:`get_versioned_cache` in all processes."""
+    version = get_random_string()
+    app.cache.set('{}_version'.format(name), version)
+    if g:  # reload in current request too
+        g.get('versioned_cache', {}).pop(name, None)
+    return version
+
+
+def get_directory():
+    """Get snapshot of active users and companies.
+
+    It's reloaded when users or companies are modified via services.
+    """
+    return get_versioned_cache(DIRECTORY_CACHE, load_directory)
+
+
+def load_directory():
+    lookup = {'is_enabled': True}
+    projection = {key: 0 for key in DIRECTORY_EXCLUDED_FIELDS}
+    all_companies = query_resource('companies', lookup=lookup)
+    companies = {str(company['_id']): company for company in all_companies
+                 if is_company_enabled({'company': company['_id']}, company)}
+    all_users = query_resource('users', lookup=lookup, projection=projection)
+    users = {str(user['_id']): user for user in all_users
+             if is_company_enabled(user, companies.get(str(user.get('company'))))}
+    return {
+        'users': MappingProxyType(users),
+        'companies': MappingProxyType(companies),
+    }
+
+
+def bump_directory_version():
+    """Invalidate active users and companies snapshot in all processes."""
+    bump_cache_version(DIRECTORY_CACHE)
 
 
 def get_cached_resource_by_id(resource, _id, black_list_keys=None):
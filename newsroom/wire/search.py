@@ -11,7 +11,7 @@ import newsroom
 from newsroom.products.products import get_products_by_navigation
 from newsroom.settings import get_setting
 from newsroom.template_filters import is_admin
-from newsroom.utils import get_local_date, get_end_date
+from newsroom.utils import get_local_date, get_end_date, get_entity_dict, get_items_by_id
 from newsroom.search import BaseSearchService, SearchQuery, query_string
 
 logger = logging.getLogger(__name__)
@@ -79,6 +79,24 @@ def items_query(ignore_latest=False):
     return query
 
 
+def topics_query(item_id=None):
+    query = {
+        'bool': {
+            'must_not': [
+                {'term': {'type': 'composite'}},
+                {'constant_score': {'filter': {'exists': {'field': 'nextversion'}}}},
+            ],
+            'must': [],
+            'should': []
+        }
+    }
+
+    if item_id:
+        query['bool']['must'].append({'term': {'_id': item_id}})
+
+    return query
+
+
 class WireSearchService(BaseSearchService):
     section = 'wire'
 
@@ -136,16 +154,41 @@ class WireSearchService(BaseSearchService):
             )
 
     def get_product_items(self, product_id, size):
-        search = SearchQuery()
-        self.prefill_search_args(search)
-        self.prefill_search_items(search)
-        search.args['size'] = size
-
         product = get_resource_service('products').find_one(req=None, _id=product_id)
 
         if not product:
             return
 
+        search = self.get_product_items_search(product, size)
+        internal_req = self.get_internal_request(search)
+        return list(self.internal_get(internal_req, None))
+
+    def get_products_items(self, products_sizes):
+        """Get items for multiple products using single multi search.
+
+        :param products_sizes: list of (product_id, size) tuples
+        :return: list of items lists, None for missing products
+        """
+        products = get_entity_dict(get_items_by_id([product_id for product_id, _ in products_sizes], 'products'))
+        sources = []
+        for product_id, size in products_sizes:
+            product = products.get(product_id)
+            if product:
+                sources.append(self.get_product_items_search(product, size).source)
+
+        cursors = iter(self.internal_msearch(sources))
+        return [
+            list(next(cursors)) if products.get(product_id) else None
+            for product_id, _ in products_sizes
+        ]
+
+    def get_product_items_search(self, product, size):
+        search = SearchQuery()
+        self.prefill_search_args(search)
+        self.prefill_search_items(search)
+        search.args['size'] = size
+        search.args['aggs'] = False
+
         search.query['bool']['must'].append({
             "bool": {
                 "should": [
@@ -176,9 +219,7 @@ class WireSearchService(BaseSearchService):
 
         self.gen_source_from_search(search)
         search.source['post_filter'] = {'bool': {'must': []}}
-        internal_req = self.get_internal_request(search)
-
-        return list(self.internal_get(internal_req, None))
+        return search
 
     def get_navigation_story_count(self, navigations, section, company, user):
         """Get story count by navigation"""
@@ -246,18 +287,7 @@ class WireSearchService(BaseSearchService):
         :return:
         """
 
-        query = {
-            'bool': {
-                'must_not': [
-                    {'term': {'type': 'composite'}},
-                    {'constant_score': {'filter': {'exists': {'field': 'nextversion'}}}},
-                ],
-                'must': [
-                    {'term': {'_id': item_id}}
-                ],
-                'should': []
-            }
-        }
+        query = topics_query(item_id)
         aggs = {
             'topics': {
                 'filters': {
@@ -271,56 +301,11 @@ class WireSearchService(BaseSearchService):
         section_filters = get_resource_service('section_filters').get_section_filters_dict()
 
         for topic in topics:
-            search = SearchQuery()
-
-            user = users.get(str(topic['user']))
-            if not user:
-                continue
-
-            search.user = user
-            search.is_admin = is_admin(user)
-            search.company = companies.get(str(user.get('company', '')))
-
-            search.query = deepcopy(query)
-            search.section = topic.get('topic_type')
-
-            self.prefill_search_products(search)
-
-            if topic.get('query'):
-                search.query['bool']['must'].append(
-                    query_string(topic['query'])
-                )
-
-            if topic.get('created'):
-                search.query['bool']['must'].append(
-                    self.versioncreated_range(dict(
-                        created_from=topic['created'].get('from'),
-                        created_to=topic['created'].get('to'),
-                        timezone_offset=topic.get('timezone_offset', '0')
-                    ))
-                )
-
-            if topic.get('filter'):
-                search.query['bool']['must'].append(self._filter_terms(topic['filter']))
-
-            # for now even if there's no active company matching for the user
-            # continuing with the search
-            try:
-                self.validate_request(search)
-                self.apply_section_filter(search, section_filters)
-                self.apply_company_filter(search)
-                self.apply_time_limit_filter(search)
-                self.apply_products_filter(search)
-            except Forbidden:
-                logger.info(
-                    'Notification for user:{} and topic:{} is skipped'.format(
-                        user.get('_id'),
-                        topic.get('_id')
-                    )
-                )
+            topic_query = self.get_topic_query(topic, users, companies, section_filters, query)
+            if topic_query is None:
                 continue
 
-            aggs['topics']['filters']['filters'][str(topic['_id'])] = search.query
+            aggs['topics']['filters']['filters'][str(topic['_id'])] = topic_query
             queried_topics.append(topic)
 
         source = {'query': query}
@@ -344,19 +329,94 @@ class WireSearchService(BaseSearchService):
 
         return topic_matches
 
+    def get_topic_query(self, topic, users, companies, section_filters=None, query=None):
+        """ Returns the topic query with all the permissions of the topic user applied
+
+        :param topic: topic
+        :param users: user_id, user dictionary
+        :param companies: company_id, company dictionary
+        :param section_filters: section filters dictionary
+        :param query: base query, ``topics_query()`` is used if not set
+        :return: query or ``None`` if the topic user can't be notified
+        """
+
+        user = users.get(str(topic['user']))
+        if not user:
+            return
+
+        search = SearchQuery()
+        search.user = user
+        search.is_admin = is_admin(user)
+        search.company = companies.get(str(user.get('company', '')))
+
+        search.query = deepcopy(query) if query else topics_query()
+        search.section = topic.get('topic_type')
+
+        self.prefill_search_products(search)
+
+        if topic.get('query'):
+            search.query['bool']['must'].append(
+                query_string(topic['query'])
+            )
+
+        if topic.get('created'):
+            search.query['bool']['must'].append(
+                self.versioncreated_range(dict(
+                    created_from=topic['created'].get('from'),
+                    created_to=topic['created'].get('to'),
+                    timezone_offset=topic.get('timezone_offset', '0')
+                ))
+            )
+
+        if topic.get('filter'):
+            search.query['bool']['must'].append(self._filter_terms(topic['filter']))
+
+        # for now even if there's no active company matching for the user
+        # continuing with the search
+        try:
+            self.validate_request(search)
+            self.apply_section_filter(search, section_filters)
+            self.apply_company_filter(search)
+            self.apply_time_limit_filter(search)
+            self.apply_products_filter(search)
+        except Forbidden:
+            logger.info(
+                'Notification for user:{} and topic:{} is skipped'.format(
+                    user.get('_id'),
+                    topic.get('_id')
+                )
+            )
+            return
+
+        return search.query
+
     def has_permissions(self, item, ignore_latest=False):
         """Test if current user has permissions to view given item."""
+        return item['_id'] in self.get_permitted_ids([item['_id']], ignore_latest)
+
+    def get_permitted_ids(self, item_ids, ignore_latest=False):
+        """Get ids of given items current user has permissions to view.
+
+        Permissions for all the items are checked using single search.
+
+        :param item_ids: list of item ids
+        :param ignore_latest: include items which are not the latest version
+        """
+        if not item_ids:
+            return set()
+
         req = ParsedRequest()
         req.args = {
-            'size': 0,
+            'ids': list(item_ids),
+            'size': len(item_ids),
             'aggs': False,
             'ignore_latest': ignore_latest
         }
+        req.projection = json.dumps(['_id'])
         try:
-            results = self.get(req, {'_id': item['_id']})
-            return results.count() > 0
+            return {item['_id'] for item in self.get(req, None)}
         except Forbidden:
-            return False
+            return set()
 
     def apply_request_filter(self, search):
         """ Generate the filters from request args
@@ -366,6 +426,9 @@ class WireSearchService(BaseSearchService):
 
         super().apply_request_filter(search)
 
+        if isinstance(search.args.get('ids'), list):
+            search.query['bool']['must'].append({'terms': {'_id': search.args['ids']}})
+
         if search.args.get('bookmarks'):
             set_bookmarks_query(search.query, search.args['bookmarks'])
 
@@ -1,6 +1,5 @@
 import io
 import flask
-import zipfile
 import superdesk
 
 from bson import ObjectId
@@ -24,15 +23,19 @@ from newsroom.topics import get_user_topics
 from newsroom.email import send_email
 from newsroom.companies import get_user_company
 from newsroom.utils import get_entity_or_404, get_json_or_400, parse_dates, get_type, is_json_request, query_resource, \
-    get_agenda_dates, get_location_string, get_public_contacts, get_links, get_items_for_user_action, clean_card
+    get_agenda_dates, get_location_string, get_public_contacts, get_links, get_items_for_user_action, clean_card, \
+    get_entity_dict, get_items_by_id
 from newsroom.notifications import push_user_notification, push_notification
 from newsroom.companies import section
 from newsroom.template_filters import is_admin_or_internal
+from newsroom.zipstream import stream_zip
+from newsroom.formatter import format_item_cached, format_items
 
 from .search import get_bookmarks_count
 from ..upload import ASSETS_RESOURCE
 
-HOME_ITEMS_CACHE_KEY = 'home_items'
+HOME_CARD_ITEMS_CACHE_KEY = 'home_card_items:{}:{}'
+HOME_CARD_ITEMS_CACHE_TIMEOUT = 300
 HOME_EXTERNAL_ITEMS_CACHE_KEY = 'home_external_items'
 
 
@@ -86,24 +89,73 @@ def get_view_data():
     }
 
 
+def get_home_card_items_cache_key(card):
+    return HOME_CARD_ITEMS_CACHE_KEY.format(card['config']['product'], card['config'].get('size'))
+
+
 def get_items_by_card(cards):
-    if app.cache.get(HOME_ITEMS_CACHE_KEY):
-        return app.cache.get(HOME_ITEMS_CACHE_KEY)
+    """Get items for home page cards.
 
+    Items are cached per card product, cards which are not cached
+    are fetched using single multi search.
+    """
     items_by_card = {}
+    missing_cards = []
     for card in cards:
         if card['config'].get('product'):
-            items_by_card[card['label']] = superdesk.get_resource_service('wire_search').\
-                get_product_items(ObjectId(card['config']['product']), card['config']['size'])
+            cached = app.cache.get(get_home_card_items_cache_key(card))
+            if cached is not None:
+                items_by_card[card['label']] = cached['items']
+            else:
+                missing_cards.append(card)
         elif card['type'] == '4-photo-gallery':
             # Omit external media, let the client manually request these
             # using '/media_card_external' endpoint
             items_by_card[card['label']] = None
 
-    app.cache.set(HOME_ITEMS_CACHE_KEY, items_by_card, timeout=300)
+    if missing_cards:
+        products_items = superdesk.get_resource_service('wire_search').get_products_items([
+            (ObjectId(card['config']['product']), card['config']['size'])
+            for card in missing_cards
+        ])
+        for card, items in zip(missing_cards, products_items):
+            items_by_card[card['label']] = items
+            app.cache.set(get_home_card_items_cache_key(card), {'items': items},
+                          timeout=HOME_CARD_ITEMS_CACHE_TIMEOUT)
+
     return items_by_card
 
 
+def delete_home_card_items_cache(items=None):
+    """Delete cached items of home page cards which could contain given items.
+
+    Cards for products with ``sd_product_id`` are deleted only when it's one of the items products,
+    products with query can't be matched without search so those are deleted always.
+    Without items all cards are deleted.
+
+    :param items: list of items
+    """
+    cards = [card for card in query_resource('cards', lookup={'dashboard': 'newsroom'})
+             if (card.get('config') or {}).get('product')]
+    if not cards:
+        return
+
+    products = get_entity_dict(get_items_by_id([ObjectId(card['config']['product']) for card in cards], 'products'))
+    codes = None
+    if items is not None:
+        codes = {str(product.get('code')) for item in items for product in item.get('products') or []}
+
+    keys = []
+    for card in cards:
+        product = products.get(ObjectId(card['config']['product']))
+        if codes is None or not product or product.get('query') or \
+                (product.get('sd_product_id') and str(product['sd_product_id']) in codes):
+            keys.append(get_home_card_items_cache_key(card))
+
+    if keys:
+        app.cache.delete_many(*keys)
+
+
 def get_home_data():
     user = get_user()
     cards = [clean_card(card) for card in query_resource('cards', lookup={'dashboard': 'newsroom'})]
@@ -123,9 +175,13 @@ def get_home_data():
     }
 
 
-def get_previous_versions(item):
+def get_previous_versions(item, section='wire'):
     if item.get('ancestors'):
-        ancestors = superdesk.get_resource_service('wire_search').get_items(item['ancestors'])
+        service = superdesk.get_resource_service('{}_search'.format(section))
+        ancestors = service.get_items(item['ancestors'])
+        permitted_ids = service.get_permitted_ids(item['ancestors'], ignore_latest=True)
+        for ancestor in ancestors:
+            set_item_permission(ancestor, ancestor['_id'] in permitted_ids)
         return sorted(
             ancestors,
             key=itemgetter('versioncreated'),
@@ -185,6 +241,7 @@ def download(_ids):
     items = get_items_for_user_action(_ids.split(','), item_type)
 
     _file = io.BytesIO()
+    zip_entries = None
     formatter = app.download_formatters[_format]['formatter']
     mimetype = None
     attachment_filename = '%s-newsroom.zip' % utcnow().strftime('%Y%m%d%H%M')
@@ -199,41 +256,51 @@ def download(_ids):
             except ValueError:
                 return flask.abort(404)
         else:
-            with zipfile.ZipFile(_file, mode='w') as zf:
-                for item in items:
-                    try:
-                        picture = formatter.format_item(item, item_type=item_type)
-                        file = flask.current_app.media.get(picture['media'], ASSETS_RESOURCE)
-                        zf.writestr(
-                            'baseimage%s' % picture['file_extension'],
-                            file.read()
-                        )
-                    except ValueError:
-                        pass
-            _file.seek(0)
+            zip_entries = get_picture_files(formatter, items, item_type)
     elif len(items) == 1 or _format == 'monitoring':
         item = items[0]
-        args_item = item if _format != 'monitoring' else items
         parse_dates(item)  # fix for old items
-        _file.write(formatter.format_item(args_item, item_type=item_type))
+        if _format == 'monitoring':
+            _file.write(formatter.format_item(items, item_type=item_type))
+        else:
+            _file.write(format_item_cached(formatter, item, item_type=item_type))
         _file.seek(0)
         mimetype = formatter.get_mimetype(item)
         attachment_filename = secure_filename(formatter.format_filename(item))
     else:
-        with zipfile.ZipFile(_file, mode='w') as zf:
-            for item in items:
-                parse_dates(item)  # fix for old items
-                zf.writestr(
-                    secure_filename(formatter.format_filename(item)),
-                    formatter.format_item(item, item_type=item_type)
-                )
-        _file.seek(0)
+        zip_entries = get_formatted_files(formatter, items, item_type)
 
     update_action_list(_ids.split(','), 'downloads', force_insert=True)
     get_resource_service('history').create_history_record(items, 'download', user, request.args.get('type', 'wire'))
+    if zip_entries is not None:
+        # zip is written while sending the response so only current entry is kept in memory
+        response = app.response_class(flask.stream_with_context(stream_zip(zip_entries)), mimetype='application/zip')
+        response.headers.add('Content-Disposition', 'attachment', filename=attachment_filename)
+        return response
     return flask.send_file(_file, mimetype=mimetype, attachment_filename=attachment_filename, as_attachment=True)
 
 
+def get_picture_files(formatter, items, item_type):
+    """Generate zip entries with pictures, media files are read when writing the entry."""
+    for item in items:
+        try:
+            picture = formatter.format_item(item, item_type=item_type)
+            file = app.media.get(picture['media'], ASSETS_RESOURCE)
+        except ValueError:
+            continue
+        if file:
+            yield 'baseimage%s' % picture['file_extension'], file
+
+
+def get_formatted_files(formatter, items, item_type):
+    """Generate zip entries with formatted items, items which fail to format are skipped."""
+    for item in items:
+        parse_dates(item)  # fix for old items
+    pool_size = app.config.get('DOWNLOAD_FORMATTER_POOL_SIZE')
+    for item, formatted in format_items(formatter, items, item_type=item_type, pool_size=pool_size):
+        yield secure_filename(formatter.format_filename(item)), formatted
+
+
 @blueprint.route('/wire_share', methods=['POST'])
 @login_required
 def share():
@@ -386,8 +453,13 @@ def item(_id):
 @login_required
 def items(_ids):
     item_ids = _ids.split(',')
-    items = superdesk.get_resource_service('wire_search').get_items(item_ids)
+    service = superdesk.get_resource_service('wire_search')
+    items = service.get_items(item_ids)
+    permitted_ids = service.get_permitted_ids(
+        item_ids,
+        False if flask.request.args.get('ignoreLatest') == 'false' else True
+    )
     for item in items:
-        set_permissions(item, 'wire', False if flask.request.args.get('ignoreLatest') == 'false' else True)
+        set_item_permission(item, item['_id'] in permitted_ids)
 
     return jsonify(items.docs), 200
@@ -0,0 +1,65 @@
+"""Zip files streamed to the client while being written.
+
+Entries are written one by one and the compressed data is yielded after each one,
+so only a single entry (or a single chunk of media file) is kept in memory.
+"""
+
+import sys
+import zipfile
+
+from contextlib import closing
+
+#: size of chunks used when copying file objects into zip
+ZIP_CHUNK_SIZE = 1024 * 256
+
+
+class ZipStream():
+    """Write only file object buffering data written by :class:`zipfile.ZipFile`.
+
+    It's not seekable so zip file will use data descriptors
+    instead of seeking back to update entry headers.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        """Get data written since last call."""
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_zip(entries):
+    """Generate zip file content entry by entry.
+
+    File objects are copied in chunks of ``ZIP_CHUNK_SIZE``
+    and every chunk is yielded as soon as it's compressed.
+    These are closed once written or when the download is interrupted.
+
+    :param entries: iterable of ``(filename, data)`` where data is ``str``, ``bytes`` or file object
+    """
+    stream = ZipStream()
+    with zipfile.ZipFile(stream, mode='w') as zf:
+        for filename, data in entries:
+            if not hasattr(data, 'read'):
+                zf.writestr(filename, data)
+                yield stream.pop()
+                continue
+            with closing(data):
+                if sys.version_info < (3, 6):  # writing via ZipFile.open is supported since 3.6
+                    zf.writestr(filename, data.read())
+                else:
+                    with zf.open(filename, mode='w') as dest:
+                        for chunk in iter(lambda: data.read(ZIP_CHUNK_SIZE), b''):
+                            dest.write(chunk)
+                            yield stream.pop()
+            yield stream.pop()
+    yield stream.pop()
@@ -20,6 +20,8 @@ def update_config(conf):
     conf['BABEL_DEFAULT_TIMEZONE'] = 'Europe/Prague'
     conf['DEFAULT_TIMEZONE'] = 'Europe/Prague'
     conf['NEWS_API_ENABLED'] = True
+    conf['SEARCH_AGGREGATIONS_CACHE_TIMEOUT'] = 0
+    conf['FORMATTER_CACHE_TIMEOUT'] = 0
     return conf
 
 
@@ -65,3 +67,11 @@ def setup(app):
         app.data.init_elastic(app)
         clean_databases(app)
         yield
+
+
+@fixture
+def versioned_cache(app):
+    """Use data cached by :func:`newsroom.utils.get_versioned_cache`, it's reloaded on every call when testing."""
+    app.testing = False
+    yield
+    app.testing = True
@@ -2,6 +2,7 @@ from flask import json, url_for
 from bson import ObjectId
 from .test_users import test_login_succeeds_for_admin, init as user_init  # noqa
 from superdesk import get_resource_service
+from unittest import mock
 
 
 def test_delete_company_deletes_company_and_users(client):
@@ -85,7 +86,9 @@ def test_save_company_permissions(client, app):
 
     test_login_succeeds_for_admin(client)
     data = json.dumps({'products': {'p-2': True}, 'sections': {'wire': True}, 'archive_access': True})
-    client.post('companies/c-1/permissions', data=data, content_type='application/json')
+    with mock.patch('newsroom.companies.views.queue_topics_update') as queue_topics_update:
+        client.post('companies/c-1/permissions', data=data, content_type='application/json')
+    queue_topics_update.assert_called_once_with(company_ids=['c-1'])
 
     response = client.get('/products')
     data = json.loads(response.get_data())
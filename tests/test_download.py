@@ -2,15 +2,21 @@ import io
 import json
 
 import bson
+import time
 import lxml
 import zipfile
 import icalendar
 
+from unittest import mock
+
 from datetime import timedelta
 from superdesk.utc import utcnow
 
 from .fixtures import items, init_items, init_auth, agenda_items, init_agenda_items  # noqa
 from .test_push import upload_binary
+from newsroom import zipstream
+from newsroom.wire.formatters import NITFFormatter
+from newsroom.formatter import format_items
 
 items_ids = [item['_id'] for item in items[:2]]
 item = items[:2][0]
@@ -182,3 +188,84 @@ def test_agenda_download(client, app):
     assert history[0].get('versioncreated') + timedelta(seconds=2) >= utcnow()
     assert history[0].get('item') == agenda_items[0]['_id']
     assert history[0].get('company') is None
+
+
+def test_get_entities_in_order_using_elastic_and_mongo(app):
+    from werkzeug.exceptions import NotFound
+    from newsroom.utils import get_entities_elastic_or_mongo_or_404
+
+    app.data.mongo.insert('items', [{'_id': 'mongo-only', 'type': 'text', 'headline': 'Mongo only'}])
+    ids = [items[1]['_id'], 'mongo-only', items[0]['_id']]
+    with app.test_request_context():
+        assert ids == [item['_id'] for item in get_entities_elastic_or_mongo_or_404(ids, 'items')]
+
+        try:
+            get_entities_elastic_or_mongo_or_404(ids + ['missing'], 'items')
+            assert False, 'should raise 404'
+        except NotFound:
+            pass
+
+
+def test_zip_download_is_streamed(client, app, monkeypatch):
+    setup_image(client, app)
+    resp = client.get('/download/%s?format=picture' % ','.join(items_ids))
+    assert resp.status_code == 200
+    assert resp.is_streamed
+
+    monkeypatch.setattr(zipstream, 'ZIP_CHUNK_SIZE', 10)
+    chunks = list(zipstream.stream_zip([('foo.txt', 'foo'), ('bar.jpg', io.BytesIO(b'x' * 100))]))
+    assert len(chunks) > 10
+    assert all(b'x' * 100 not in chunk for chunk in chunks)
+    with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as zf:
+        assert ['foo.txt', 'bar.jpg'] == zf.namelist()
+        assert b'x' * 100 == zf.read('bar.jpg')
+
+    # files are closed when written and when the download is interrupted
+    files = [io.BytesIO(b'x' * 100), io.BytesIO(b'y' * 100)]
+    list(zipstream.stream_zip([('foo.jpg', files[0])]))
+    stream = zipstream.stream_zip([('bar.jpg', files[1])])
+    next(stream)
+    stream.close()
+    assert all(file.closed for file in files)
+
+
+def test_formatted_items_are_cached(client, app):
+    app.config['FORMATTER_CACHE_TIMEOUT'] = 60
+    with mock.patch.object(NITFFormatter, 'format_item', autospec=True,
+                           side_effect=NITFFormatter.format_item) as format_item:
+        for _ in range(2):
+            _file = download_zip_file(client, 'nitf', 'wire')
+            with zipfile.ZipFile(_file) as zf:
+                nitf_content_test(zf.read(filename('amazon-bookstore-opening.xml', item)))
+        assert len(items_ids) == format_item.call_count
+
+        app.data.update('items', item['_id'], {'version': 3}, item)
+        download_zip_file(client, 'nitf', 'wire')
+        assert len(items_ids) + 1 == format_item.call_count
+
+
+def test_parallel_download_skips_failed_items(client, app):
+    app.config['DOWNLOAD_FORMATTER_POOL_SIZE'] = 2
+    format_item = NITFFormatter.format_item
+
+    def format_or_fail(self, _item, item_type='items'):
+        if _item['_id'] != item['_id']:
+            raise ValueError('invalid item')
+        return format_item(self, _item, item_type=item_type)
+
+    with mock.patch.object(NITFFormatter, 'format_item', format_or_fail):
+        _file = download_zip_file(client, 'nitf', 'wire')
+    with zipfile.ZipFile(_file) as zf:
+        assert [filename('amazon-bookstore-opening.xml', item)] == zf.namelist()
+
+
+def test_format_items_in_order(app):
+    class SlowFormatter():
+        def format_item(self, item, item_type='items'):
+            time.sleep(0.01 * (item['_id'] % 3))
+            return str(item['_id'])
+
+    batch = [{'_id': i} for i in range(20)]
+    for pool_size in (0, 4):
+        formatted = list(format_items(SlowFormatter(), batch, pool_size=pool_size))
+        assert [str(i) for i in range(20)] == [output for _item, output in formatted]
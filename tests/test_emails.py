@@ -1,5 +1,8 @@
-from newsroom.email import send_new_item_notification_email
-from flask import render_template_string, json, url_for
+import pytest
+
+from newsroom.email import send_new_item_notification_email, send_email, bulk_emails, _send_emails, \
+    render_notification_template, get_render_stats
+from flask import render_template_string, json, url_for, g
 
 
 def test_item_notification_template(client, app, mocker):
@@ -58,3 +61,69 @@ Link: {{ item_url }}
 
 {% endblock %}
 """, app_name=app.config['SITE_NAME'], item_url=item_url))
+
+
+def test_bulk_emails_are_sent_in_chunks(app, mocker):
+    app.config['MAIL_BULK_CHUNK_SIZE'] = 2
+    task = mocker.patch('newsroom.email._send_emails.apply_async')
+    single_task = mocker.patch('newsroom.email._send_email.apply_async')
+
+    with app.test_request_context():
+        with bulk_emails():
+            for i in range(5):
+                send_email(to=['foo%d@example.com' % i], subject='Foo', text_body='foo')
+            assert not task.called
+
+    assert not single_task.called
+    assert [2, 2, 1] == [len(call[1]['kwargs']['messages']) for call in task.call_args_list]
+    assert ['foo4@example.com'] == task.call_args_list[-1][1]['kwargs']['messages'][0]['to']
+
+
+def test_bulk_emails_are_not_sent_on_error(app, mocker):
+    task = mocker.patch('newsroom.email._send_emails.apply_async')
+
+    with app.test_request_context():
+        with pytest.raises(ValueError):
+            with bulk_emails():
+                send_email(to=['foo@example.com'], subject='Foo', text_body='foo')
+                raise ValueError('retry')
+        assert g.get('bulk_emails') is None
+
+    assert not task.called
+
+
+def test_bulk_emails_errors_per_recipient(app):
+    messages = [
+        {'to': ['foo@example.com'], 'subject': 'Foo', 'text_body': 'foo'},
+        {'to': [], 'subject': 'Foo', 'text_body': 'foo'},
+        {'to': ['bar@example.com'], 'subject': 'Bar', 'text_body': 'bar'},
+    ]
+
+    with app.mail.record_messages() as outbox:
+        errors = _send_emails(messages)
+
+    assert 2 == len(outbox)
+    assert 1 == len(errors)
+    assert [] == errors[0]['to']
+
+
+def test_notification_template_is_rendered_once_per_item(app):
+    item = {'_id': 'foo', 'version': 1}
+    stats = get_render_stats()
+
+    with app.test_request_context():
+        for name in ['John', 'Jane <b>']:
+            text = render_notification_template('validate_account_email.txt', item, name=name,
+                                                app_name='Newsroom', url='http://example.com', expires=24)
+            assert text.startswith('{},'.format(name))
+
+            html = render_notification_template('validate_account_email.html', item, name=name,
+                                                app_name='Newsroom', url='http://example.com', expires=24)
+            assert 'Jane <b>' not in html
+
+        text = render_notification_template('validate_account_email.txt', dict(item, version=2), name='John',
+                                            app_name='Newsroom', url='http://example.com', expires=24)
+        assert text.startswith('John,')
+
+    assert stats['misses'] + 3 == get_render_stats()['misses']
+    assert stats['hits'] + 2 == get_render_stats()['hits']
@@ -0,0 +1,101 @@
+import time
+
+from bson import ObjectId
+from datetime import timedelta
+from superdesk import get_resource_service
+from superdesk.utc import utcnow
+
+from newsroom.celery_app import dumps, loads
+from newsroom.history import get_history_buffer, get_history_users_by_section, _write_history
+
+user = {'_id': ObjectId(), 'company': ObjectId()}
+items = [{'_id': 'foo', 'version': '1'}, {'_id': 'bar', 'version': '2'}]
+
+
+def test_create_history_records_in_bulk(app):
+    get_resource_service('history').create_history_record(items, 'download', user, 'wire')
+    history = app.data.find('history', None, None)
+    assert 2 == history.count()
+    assert {'foo', 'bar'} == {record['item'] for record in history}
+
+
+def test_history_bulk_skips_duplicates(app):
+    service = get_resource_service('history')
+    records = [{'_id': ObjectId(), 'action': 'download', 'item': item['_id'], 'user': user['_id']} for item in items]
+    assert 1 == service.bulk(records[:1])
+    assert 1 == service.bulk(records)
+    assert 2 == app.data.find('history', None, None).count()
+
+
+def test_buffered_history_records(app):
+    app.config['HISTORY_WRITE_MODE'] = 'buffer'
+    app.config['HISTORY_BUFFER_SIZE'] = 3
+
+    service = get_resource_service('history')
+    service.create_history_record(items, 'download', user, 'wire')
+    assert 0 == app.data.find('history', None, None).count()
+
+    service.create_history_record(items, 'share', user, 'wire')
+    assert 4 == app.data.find('history', None, None).count()
+
+    service.create_history_record(items[:1], 'print', user, 'wire')
+    get_history_buffer().flush()
+    assert 5 == app.data.find('history', None, None).count()
+
+
+def test_buffered_history_records_are_written_by_timer(app):
+    app.config['HISTORY_WRITE_MODE'] = 'buffer'
+    app.config['HISTORY_BUFFER_TIMEOUT'] = 0.1
+
+    get_resource_service('history').create_history_record(items, 'download', user, 'wire')
+    assert 0 == app.data.find('history', None, None).count()
+
+    time.sleep(0.5)
+    assert 2 == app.data.find('history', None, None).count()
+
+
+def test_celery_history_records_keep_string_ids(app):
+    item_id = str(ObjectId())
+    records = [{'_id': ObjectId(), 'action': 'download', 'item': item_id, 'version': '1',
+                'user': user['_id'], 'section': 'wire'}]
+    _write_history(**loads(dumps({'records': records})))
+    history = app.data.find('history', None, None)
+    assert 1 == history.count()
+    assert item_id == history[0]['item']
+
+
+def test_get_history_users_by_section(app):
+    other_user = {'_id': ObjectId(), 'company': user['company']}
+    inactive_user = {'_id': ObjectId(), 'company': user['company']}
+    service = get_resource_service('history')
+    service.create_history_record(items, 'download', user, 'wire')
+    service.create_history_record(items, 'download', other_user, 'agenda')
+    service.create_history_record(items, 'download', inactive_user, 'wire')
+    service.create_history_record(items, 'share', other_user, 'wire')
+
+    history_users = get_history_users_by_section(
+        ['foo', 'bar'],
+        [user['_id'], other_user['_id']],
+        [user['company']],
+        ['wire', 'agenda', 'am'],
+        'download'
+    )
+
+    assert history_users == {
+        'wire': [str(user['_id'])],
+        'agenda': [str(other_user['_id'])],
+        'am': [],
+    }
+
+
+def test_fetch_all_history_using_cursor(app):
+    service = get_resource_service('history')
+    now = utcnow()
+    records = [{'_id': ObjectId(), 'action': 'download', 'item': 'foo', 'user': user['_id'],
+                'versioncreated': now - timedelta(minutes=i % 2)} for i in range(5)]
+    service.bulk(records)
+
+    query = {'sort': [{'versioncreated': 'desc'}], 'size': 2, 'from': 0}
+    history = service.fetch_history(query, all=True)
+    assert 5 == len(history['items'])
+    assert {str(record['_id']) for record in records} == {str(record['_id']) for record in history['items']}
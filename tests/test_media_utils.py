@@ -0,0 +1,21 @@
+from PIL import Image
+
+from newsroom.media_utils import get_watermark, load_watermark
+
+
+def get_full_watermark(image, watermark_image):
+    layer = Image.new('RGBA', image.size)
+    layer.paste(watermark_image, (
+        image.size[0] - watermark_image.size[0],
+        int((image.size[1] - watermark_image.size[1]) * 0.66),
+    ))
+    return Image.alpha_composite(image.convert('RGBA'), layer).convert('RGB')
+
+
+def test_watermark_composites_only_overlay_box(app):
+    watermark_image = load_watermark(app.config['WATERMARK_IMAGE'])
+    assert watermark_image is load_watermark(app.config['WATERMARK_IMAGE'])
+
+    for size in [(800, 600), (100, 50), watermark_image.size]:
+        image = Image.new('RGB', size, (200, 100, 50))
+        assert list(get_full_watermark(image, watermark_image).getdata()) == list(get_watermark(image).getdata())
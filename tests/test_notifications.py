@@ -3,7 +3,7 @@ from bson import ObjectId
 import datetime
 from superdesk.utc import utcnow
 from superdesk import get_resource_service
-from newsroom.notifications import get_user_notifications
+from newsroom.notifications import get_user_notifications, init_ttl_index
 from .fixtures import init_company, PUBLIC_USER_ID, TEST_USER_ID  # noqa
 
 user = str(PUBLIC_USER_ID)
@@ -100,3 +100,22 @@ def test_delete_all_notifications(client):
     resp = client.get(notifications_url)
     data = json.loads(resp.get_data())
     assert 0 == len(data['_items'])
+
+
+def test_notifications_upsert_counts(client, app):
+    service = get_resource_service('notifications')
+    counts = service.upsert([notification, {'item': 'Bar', 'user': user}])
+    assert counts == {'inserted': 2, 'refreshed': 0}
+
+    counts = service.upsert([notification, notification, {'item': 'Baz', 'user': user}])
+    assert counts == {'inserted': 1, 'refreshed': 1}
+    assert 3 == len(get_user_notifications(ObjectId(user)))
+
+
+def test_notifications_ttl_index(client, app):
+    app.config['NOTIFICATIONS_TTL'] = 2
+    init_ttl_index(app)
+    app.config['NOTIFICATIONS_TTL'] = 3
+    init_ttl_index(app)
+    indexes = app.data.get_mongo_collection('notifications').index_information()
+    assert indexes['created_ttl']['expireAfterSeconds'] == 3 * 24 * 60 * 60
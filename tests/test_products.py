@@ -120,3 +120,31 @@ def test_gets_all_products(client, app):
     resp = client.get('/products')
     data = json.loads(resp.get_data())
     assert 251 == len(data)
+
+
+def test_products_by_company_are_cached_until_products_change(app, versioned_cache):
+    from superdesk import get_resource_service
+    from newsroom.products.products import get_products_by_company, get_product_by_id
+    company_id = ObjectId()
+    product_id = ObjectId('59b4c5c61d41c8d736852fbf')
+    get_resource_service('products').system_update(product_id, {'companies': [str(company_id)]}, {})
+
+    with app.test_request_context():
+        products = get_products_by_company(company_id, product_type='wire')
+        assert [] == products
+        products = get_products_by_company(company_id)
+        assert ['Sport'] == [p['name'] for p in products]
+        assert 1 == len(get_product_by_id(product_id, company_id=company_id))
+        assert 0 == len(get_product_by_id(product_id, company_id=ObjectId()))
+
+    # changed without service hooks, cached products are used
+    app.data.get_mongo_collection('products').update_one({'_id': product_id}, {'$set': {'product_type': 'wire'}})
+    with app.test_request_context():
+        assert [] == get_products_by_company(company_id, product_type='wire')
+
+    with app.test_request_context():
+        get_resource_service('products').patch(product_id, {'product_type': 'wire'})
+
+    with app.test_request_context():
+        products = get_products_by_company(company_id, product_type='wire')
+        assert ['Sport'] == [p['name'] for p in products]
@@ -78,6 +78,35 @@ def test_notify_invalid_signature(client, app):
     assert 403 == resp.status_code
 
 
+def test_push_batch(client, app):
+    key = b'something random'
+    app.config['PUSH_KEY'] = key
+    data = json.dumps([
+        {'guid': 'foo', 'type': 'text', 'headline': 'Foo'},
+        {'guid': 'bar', 'type': 'text', 'headline': 'Bar'},
+        {'guid': 'baz', 'type': 'unknown'},
+        {'_id': 'qux', 'type': 'text', 'headline': 'Qux'},
+    ])
+    headers = get_signature_headers(data, key)
+    resp = client.post('/push_batch', data=data, content_type='application/json', headers=headers)
+    assert 200 == resp.status_code
+    results = json.loads(resp.get_data())['_items']
+    assert ['OK', 'OK', 'ERR', 'OK'] == [r['status'] for r in results]
+    assert ['foo', 'bar', 'baz', 'qux'] == [r['guid'] for r in results]
+
+    resp = client.get('wire/bar?format=json')
+    assert 200 == resp.status_code
+    assert 'Bar' == json.loads(resp.get_data())['headline']
+
+
+def test_push_batch_invalid_signature(client, app):
+    app.config['PUSH_KEY'] = b'foo'
+    data = json.dumps([{'guid': 'foo', 'type': 'text'}])
+    headers = get_signature_headers(data, b'bar')
+    resp = client.post('/push_batch', data=data, content_type='application/json', headers=headers)
+    assert 403 == resp.status_code
+
+
 def test_push_binary(client):
     media_id = str(bson.ObjectId())
 
@@ -254,6 +283,130 @@ def test_push_featuremedia_has_renditions_for_existing_media(client):
         assert 200 == resp.status_code
 
 
+def test_push_featuremedia_generates_renditions_async(client, app, mocker):
+    from newsroom.push import _generate_renditions
+    app.config['RENDITIONS_ASYNC'] = True
+    task_mock = mocker.patch('newsroom.push._generate_renditions.apply_async')
+    media_id = str(bson.ObjectId())
+    upload_binary('picture.jpg', client, media_id=media_id)
+    item = {
+        'guid': 'test',
+        'type': 'text',
+        'associations': {
+            'featuremedia': {
+                'type': 'picture',
+                'mimetype': 'image/jpeg',
+                'renditions': {
+                    '4-3': {
+                        'media': media_id,
+                    },
+                    'baseImage': {
+                        'media': media_id,
+                    },
+                    'viewImage': {
+                        'media': media_id,
+                    }
+                }
+            }
+        }
+    }
+
+    resp = client.post('/push', data=json.dumps(item), content_type='application/json')
+    assert 200 == resp.status_code
+    assert {'item_id': 'test', 'media_id': media_id} == task_mock.call_args[1]['kwargs']
+
+    resp = client.get('/wire/test?format=json')
+    data = json.loads(resp.get_data())
+    assert '_newsroom_thumbnail' not in data['associations']['featuremedia']['renditions']
+
+    _generate_renditions(item_id='test', media_id=media_id)
+
+    resp = client.get('/wire/test?format=json')
+    data = json.loads(resp.get_data())
+    picture = data['associations']['featuremedia']
+    for name in ['thumbnail', 'thumbnail_large', 'view', 'base']:
+        rendition = picture['renditions']['_newsroom_%s' % name]
+        resp = client.get(rendition['href'])
+        assert 200 == resp.status_code
+
+    # renditions are reused for new version with same picture
+    task_mock.reset_mock()
+    resp = client.post('/push', data=json.dumps(dict(item, version=2)), content_type='application/json')
+    assert 200 == resp.status_code
+    assert not task_mock.called
+
+
+def test_push_featuremedia_generates_renditions_async_via_celery_serializer(client, app, mocker):
+    from kombu import serialization
+    from newsroom.push import _generate_renditions
+
+    def apply_async(kwargs=None, **options):
+        content_type, encoding, data = serialization.dumps(kwargs, serializer='newsroom/json')
+        _generate_renditions(**serialization.loads(data, content_type, encoding))
+
+    app.config['RENDITIONS_ASYNC'] = True
+    mocker.patch('newsroom.push._generate_renditions.apply_async', side_effect=apply_async)
+    media_id = str(bson.ObjectId())
+    upload_binary('picture.jpg', client, media_id=media_id)
+    item = {
+        'guid': 'test',
+        'type': 'text',
+        'associations': {
+            'featuremedia': {
+                'type': 'picture',
+                'mimetype': 'image/jpeg',
+                'renditions': {
+                    'baseImage': {'media': media_id},
+                    'viewImage': {'media': media_id},
+                },
+            },
+        },
+    }
+
+    resp = client.post('/push', data=json.dumps(item), content_type='application/json')
+    assert 200 == resp.status_code
+
+    data = json.loads(client.get('/wire/test?format=json').get_data())
+    assert '_newsroom_thumbnail' in data['associations']['featuremedia']['renditions']
+
+
+def test_push_invalidates_only_matching_home_cards(client, app):
+    from newsroom.wire.views import get_items_by_card
+    products = app.data.insert('products', [
+        {'name': 'Sport', 'sd_product_id': 'sport', 'is_enabled': True, 'product_type': 'wire'},
+        {'name': 'Finance', 'sd_product_id': 'finance', 'is_enabled': True, 'product_type': 'wire'},
+    ])
+    cards = [
+        {'label': 'Sport', 'type': '6-text-only', 'dashboard': 'newsroom',
+         'config': {'product': str(products[0]), 'size': 6}},
+        {'label': 'Finance', 'type': '6-text-only', 'dashboard': 'newsroom',
+         'config': {'product': str(products[1]), 'size': 6}},
+    ]
+    app.data.insert('cards', cards)
+
+    def push(guid, code):
+        resp = client.post('/push', data=json.dumps({'guid': guid, 'type': 'text', 'products': [{'code': code}]}),
+                           content_type='application/json')
+        assert 200 == resp.status_code
+
+    push('sport-1', 'sport')
+    push('finance-1', 'finance')
+
+    items_by_card = get_items_by_card(cards)
+    assert ['sport-1'] == [item['_id'] for item in items_by_card['Sport']]
+    assert ['finance-1'] == [item['_id'] for item in items_by_card['Finance']]
+
+    push('sport-2', 'sport')
+    items_by_card = get_items_by_card(cards)
+    assert ['sport-2', 'sport-1'] == [item['_id'] for item in items_by_card['Sport']]
+
+    # finance card is not invalidated by the push, so it's served from cache
+    push('finance-2', 'finance')
+    app.cache.set('home_card_items:{}:6'.format(products[1]), {'items': []})
+    push('sport-3', 'sport')
+    assert [] == get_items_by_card(cards)['Finance']
+
+
 def test_push_binary_invalid_signature(client, app):
     app.config['PUSH_KEY'] = b'foo'
     resp = client.post('/push_binary', data=dict(
@@ -445,6 +598,38 @@ def test_notify_user_matches_for_new_item_in_bookmarks(client, app, mocker):
     assert 'http://localhost:5050/wire?item=bar' in outbox[0].body
 
 
+def test_push_queues_notifications_when_async(client, app, mocker):
+    app.config['NOTIFY_NEW_ITEM_ASYNC'] = True
+    task_mock = mocker.patch('newsroom.push._notify_new_item.apply_async')
+    notify_mock = mocker.patch('newsroom.push.notify_new_item')
+    resp = client.post('/push', data=json.dumps({'guid': 'foo', 'type': 'text', 'version': 2}),
+                       content_type='application/json')
+    assert 200 == resp.status_code
+    assert not notify_mock.called
+    kwargs = task_mock.call_args[1]['kwargs']
+    assert 'foo' == kwargs['item_id']
+    assert 'items' == kwargs['resource']
+    assert 2 == kwargs['version']
+    assert kwargs['check_topics']
+
+
+def test_notify_new_item_task_is_idempotent(client, app, mocker):
+    from newsroom.push import _notify_new_item
+    resp = client.post('/push', data=json.dumps({'guid': 'foo', 'type': 'text', 'version': 2}),
+                       content_type='application/json')
+    assert 200 == resp.status_code
+
+    notify_mock = mocker.patch('newsroom.push.notify_new_item')
+    _notify_new_item(item_id='foo', resource='items', version=2, check_topics=True)
+    _notify_new_item(item_id='foo', resource='items', version=2, check_topics=True)
+    assert 1 == notify_mock.call_count
+    assert 'foo' == notify_mock.call_args[0][0]['_id']
+
+    # older version is skipped
+    _notify_new_item(item_id='foo', resource='items', version=1, check_topics=True)
+    assert 1 == notify_mock.call_count
+
+
 def test_do_not_notify_inactive_user(client, app, mocker):
     user_ids = app.data.insert('users', [{
         'email': 'foo@bar.com',
@@ -567,6 +752,49 @@ def test_matching_topics(client, app):
     assert ['created_from_future', 'query'] == matching
 
 
+def test_matching_topics_using_percolator(client, app):
+    from newsroom.topics import percolator
+    client.post('/push', data=json.dumps(item), content_type='application/json')
+
+    users = {'foo': {'_id': 'foo', 'company': '1', 'user_type': 'administrator'}}
+    companies = {'1': {'_id': 1, 'name': 'test-comp'}}
+    topics = [
+        {'_id': 'created_to_old', 'created': {'to': '2017-01-01'}},
+        {'_id': 'created_from_future', 'created': {'from': 'now/d'}, 'timezone_offset': 60 * 28},
+        {'_id': 'filter', 'filter': {'genre': ['other']}},
+        {'_id': 'query', 'query': 'Foo'},
+        {'_id': 'query_other', 'query': 'Bar'},
+    ]
+    for topic in topics:
+        topic.update({'user': 'foo', 'notifications': True, 'topic_type': 'wire'})
+
+    with app.test_request_context():
+        percolator.index_topics(topics, users, companies, {})
+        assert {'query'} == percolator.get_percolated_topic_ids(item['guid'])
+        matching = percolator.get_matching_topics(item['guid'], topics, users, companies)
+        assert ['query', 'created_from_future'] == matching
+
+        topics[3]['notifications'] = False
+        percolator.index_topics(topics[3:4], users, companies, {})
+        assert set() == percolator.get_percolated_topic_ids(item['guid'])
+
+
+def test_percolator_rebuild_indexes_before_deleting(client, app):
+    from newsroom.topics import percolator
+    users = {'foo': {'_id': 'foo', 'company': '1', 'user_type': 'administrator'}}
+    topics = [{'_id': _id, 'query': 'Foo', 'user': 'foo', 'notifications': True, 'topic_type': 'wire'}
+              for _id in ('current', 'removed')]
+    calls = []
+
+    with app.test_request_context():
+        percolator.index_topics(topics, users, {}, {})
+        with mock.patch.object(percolator, 'get_wire_topics', return_value=topics[:1]), \
+                mock.patch.object(percolator, 'index_topics', lambda topics: calls.append('index')), \
+                mock.patch.object(percolator, 'delete_topics', lambda ids: calls.append(('delete', set(ids)))):
+            assert 1 == percolator.rebuild()
+    assert ['index', ('delete', {'removed'})] == calls
+
+
 def test_matching_topics_for_public_user(client, app):
     app.data.insert('products', [{
         '_id': ObjectId('59b4c5c61d41c8d736852fbf'),
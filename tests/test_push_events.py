@@ -294,6 +294,27 @@ def test_push_parsed_planning_for_an_existing_event(client, app):
     assert 2 == len(parsed_planning['coverages'])
 
 
+def test_push_batch_event_and_its_planning(client, app):
+    event = deepcopy(test_event)
+    event['guid'] = 'foo6'
+    planning = deepcopy(test_planning)
+    planning['guid'] = 'bar6'
+    planning['event_item'] = 'foo6'
+    updated = deepcopy(event)
+    updated['state'] = 'cancelled'
+    updated['pubstatus'] = 'cancelled'
+
+    resp = client.post('/push_batch', data=json.dumps([event, planning, updated]), content_type='application/json')
+    assert 200 == resp.status_code
+    results = json.loads(resp.get_data())['_items']
+    assert ['OK', 'OK', 'OK'] == [result['status'] for result in results]
+
+    parsed = get_entity_or_404('foo6', 'agenda')
+    assert 'cancelled' == parsed['event']['pubstatus']
+    assert ['bar6'] == [plan['guid'] for plan in parsed['planning_items']]
+    assert 2 == len(parsed['coverages'])
+
+
 def test_push_coverages_with_different_dates_for_an_existing_event(client, app):
     event = deepcopy(test_event)
     event['guid'] = 'foo4'
@@ -164,3 +164,33 @@ def test_expired_companies(client, app):
     report = json.loads(resp.get_data())
     assert report['name'] == 'Expired companies'
     assert len(report['results']) == 2
+
+
+def test_subscriber_activity_next_page(client, app):
+    now = datetime.utcnow()
+    app.data.insert('history', [{
+        '_id': ObjectId(),
+        'action': 'download',
+        'item': 'foo',
+        'version': '1',
+        'section': 'wire',
+        'user': str(ObjectId()),
+        'company': '59bc460f1d41c8fa815cc2c2',
+        'versioncreated': now - timedelta(minutes=i % 2),
+    } for i in range(30)])
+
+    test_login_succeeds_for_admin(client)
+    resp = client.get('reports/subscriber-activity')
+    assert 200 == resp.status_code
+    data = json.loads(resp.get_data())
+    assert 25 == len(data['results'])
+    assert data['_next']
+
+    resp = client.get('reports/subscriber-activity?next={}'.format(data['_next']))
+    assert 200 == resp.status_code
+    next_data = json.loads(resp.get_data())
+    assert 5 == len(next_data['results'])
+    assert next_data['_next'] is None
+
+    ids = {doc['_id'] for doc in data['results'] + next_data['results']}
+    assert 30 == len(ids)
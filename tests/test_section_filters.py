@@ -106,3 +106,33 @@ def test_gets_all_products(client, app):
     resp = client.get('/section_filters')
     data = json.loads(resp.get_data())
     assert 251 == len(data)
+
+
+def test_section_filter_clauses_are_cached_until_filters_change(app, versioned_cache):
+    from superdesk import get_resource_service
+    service = get_resource_service('section_filters')
+    filter_id = ObjectId('59b4c5c61d41c8d736852fbf')
+    service.system_update(filter_id, {'filter_type': 'wire', 'query': 'sport'}, {})
+
+    with app.test_request_context():
+        query = {'bool': {'must': []}}
+        service.apply_section_filter(query, 'wire')
+        assert 'sport' == query['bool']['must'][0]['query_string']['query']
+        assert ['Sport'] == [f['name'] for f in service.get_section_filters('wire')]
+
+    # changed without service hooks, cached clauses are used
+    app.data.get_mongo_collection('section_filters').update_one({'_id': filter_id}, {'$set': {'query': 'football'}})
+    with app.test_request_context():
+        query = {'bool': {'must': []}}
+        service.apply_section_filter(query, 'wire')
+        assert 'sport' == query['bool']['must'][0]['query_string']['query']
+
+    with app.test_request_context():
+        service.patch(filter_id, {'query': 'football'})
+
+    with app.test_request_context():
+        query = {'bool': {'must': []}}
+        service.apply_section_filter(query, 'wire')
+        assert 1 == len(query['bool']['must'])
+        assert 'football' == query['bool']['must'][0]['query_string']['query']
+        assert ['Sport'] == [f['name'] for f in service.get_section_filters_dict()['wire']]
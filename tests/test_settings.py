@@ -33,3 +33,22 @@ def test_news_only_filter(client, app):
 
     _items = get_json(client, '/wire/search?newsOnly=1')['_items']
     assert len(_items) == 0
+
+
+def test_general_settings_are_cached_until_updated(client, app, versioned_cache):
+    from newsroom.settings import get_settings_collection, GENERAL_SETTINGS_LOOKUP
+    app.general_setting('foo', 'Foo', default='bar')
+    with app.test_request_context():
+        assert 'bar' == get_setting('foo')
+
+    # changed without the service, cached settings are used
+    get_settings_collection().update_one(GENERAL_SETTINGS_LOOKUP, {'$set': {'values': {'foo': 'baz'}}},
+                                         upsert=True)
+    with app.test_request_context():
+        assert 'bar' == get_setting('foo')
+
+    post_json(client, '/settings/general_settings', {'foo': '<b>qux</b>'})
+    with app.test_request_context():
+        assert 'qux' == get_setting('foo')
+        assert get_setting(include_audit=True)['_updated']
+        assert '_updated' not in get_setting()
@@ -343,6 +343,40 @@ def test_active_users_and_active_companies(client, app):
         assert '2' not in companies
 
 
+def test_user_dict_is_shared_until_users_change(app, versioned_cache):
+    with app.test_request_context():
+        users = get_user_dict()
+        assert ADMIN_USER_ID in users
+        assert 'password' not in users[ADMIN_USER_ID]
+
+    # changed without service hooks, cached dict is used
+    app.data.get_mongo_collection('users').update_one({'_id': ObjectId(ADMIN_USER_ID)}, {'$set': {'is_enabled': False}})
+    with app.test_request_context():
+        assert get_user_dict() is users
+        assert ADMIN_USER_ID in get_user_dict()
+
+    with app.test_request_context():
+        user = get_resource_service('users').find_one(req=None, _id=ObjectId(ADMIN_USER_ID))
+        get_resource_service('users').patch(user['_id'], {'is_enabled': False})
+
+    with app.test_request_context():
+        assert ADMIN_USER_ID not in get_user_dict()
+
+
+def test_user_dict_is_reloaded_after_max_age(app, versioned_cache):
+    with app.test_request_context():
+        assert ADMIN_USER_ID in get_user_dict()
+
+    # changed in other process not sharing the cache
+    app.data.get_mongo_collection('users').update_one({'_id': ObjectId(ADMIN_USER_ID)}, {'$set': {'is_enabled': False}})
+    with app.test_request_context():
+        assert ADMIN_USER_ID in get_user_dict()
+
+    app.config['VERSIONED_CACHE_MAX_AGE'] = 0
+    with app.test_request_context():
+        assert ADMIN_USER_ID not in get_user_dict()
+
+
 def test_expired_company_does_not_restrict_activity(client, app):
     app.data.insert('companies', [
         {'_id': '1', 'name': 'Company1', 'is_enabled': True},
@@ -6,7 +6,7 @@ from bson import ObjectId
 from copy import deepcopy
 
 from .fixtures import items, init_items, init_auth, init_company, PUBLIC_USER_ID  # noqa
-from .utils import get_json, get_admin_user_id, mock_send_email
+from .utils import get_json, get_admin_user_id, mock_send_email, post_json
 from unittest import mock
 from tests.test_users import ADMIN_USER_ID
 from superdesk import get_resource_service
@@ -647,3 +647,184 @@ def test_highlighting(client, app):
     data = json.loads(resp.get_data())
     assert data['_items'][0]['es_highlight']['body_html'][0] == 'Story that involves <span class="es-highlight">' \
                                                                 'cheese</span> and onions'
+
+
+def test_search_filter_context_returns_same_items(client, app):
+    app.config['COMPANY_TYPES'] = [{'id': 'public', 'wire_must_not': {'term': {'service.code': 'c'}}}]
+    app.data.update('companies', 1, {'company_type': 'public'}, app.data.find_one('companies', req=None, _id=1))
+    app.data.insert('section_filters', [{
+        '_id': 'f1', 'name': 'Text only', 'query': 'type:text', 'filter_type': 'wire', 'is_enabled': True,
+    }])
+    app.data.insert('navigations', [{'_id': 51, 'name': 'nav', 'is_enabled': True, 'product_type': 'wire'}])
+    app.data.insert('products', [{
+        '_id': 12, 'name': 'codes', 'sd_product_id': 1, 'companies': ['1'], 'navigations': ['51'],
+        'product_type': 'wire', 'is_enabled': True,
+    }, {
+        '_id': 13, 'name': 'weather', 'query': 'headline:Weather', 'companies': ['1'],
+        'product_type': 'wire', 'is_enabled': True,
+    }])
+    post_json(client, '/settings/general_settings', {'wire_time_limit_days': 6})
+
+    urls = [
+        '/wire/search',
+        '/wire/search?q=weather',
+        '/wire/search?navigation=51',
+        '/wire/search?newsOnly=1',
+        '/agenda/search',
+    ]
+
+    def get_ids(url):
+        return sorted(item['_id'] for item in get_json(client, url)['_items'])
+
+    for user_id, user_type in [(ADMIN_USER_ID, 'administrator'), (PUBLIC_USER_ID, 'public')]:
+        with client.session_transaction() as session:
+            session['user'] = str(user_id)
+            session['user_type'] = user_type
+
+        for url in urls:
+            app.config['SEARCH_FILTER_CONTEXT'] = False
+            expected = get_ids(url)
+            app.config['SEARCH_FILTER_CONTEXT'] = True
+            assert expected == get_ids(url), url
+
+
+def test_search_next_page_token(client, app):
+    for item in items:
+        app.data.update('items', item['_id'], {'guid': item['_id']}, item)
+
+    expected = [item['_id'] for item in get_json(client, '/wire/search')['_items']]
+    assert len(expected) > 1
+    assert '_next' not in get_json(client, '/wire/search?size=1')
+
+    ids = []
+    data = get_json(client, '/wire/search?size=1&cursor=1')
+    while data.get('_next'):
+        ids.extend(item['_id'] for item in data['_items'])
+        assert '_aggregations' not in data or len(ids) == 1
+        data = get_json(client, '/wire/search?size=1&next={}'.format(data['_next']))
+    ids.extend(item['_id'] for item in data['_items'])
+    assert expected == ids
+
+    resp = client.get('/wire/search?next=foo')
+    assert 400 == resp.status_code
+
+
+def test_search_aggregations_are_cached_until_push(client, app):
+    from newsroom.search import bump_aggregations_version
+    app.config['SEARCH_AGGREGATIONS_CACHE_TIMEOUT'] = 60
+
+    def get_services(data):
+        return sorted(bucket['key'] for bucket in data['_aggregations']['service']['buckets'])
+
+    data = get_json(client, '/wire/search')
+    services = get_services(data)
+    assert 'Service D' not in services
+
+    app.data.insert('items', [{
+        '_id': 'urn:localhost:new', 'type': 'text', 'headline': 'New', 'versioncreated': datetime.now(),
+        'service': [{'code': 'd', 'name': 'Service D'}],
+    }])
+
+    data = get_json(client, '/wire/search')
+    assert 'urn:localhost:new' in [item['_id'] for item in data['_items']]
+    assert services == get_services(data)
+
+    with app.test_request_context():
+        bump_aggregations_version('items')
+
+    data = get_json(client, '/wire/search')
+    assert 'Service D' in get_services(data)
+
+
+def test_identical_concurrent_searches_are_coalesced(app):
+    import time
+    import threading
+    import newsroom
+    from eve.utils import ParsedRequest
+    from eve_elastic.elastic import ElasticCursor
+    from newsroom.search import get_search_flight_stats
+
+    app.config['SEARCH_COALESCING'] = True
+    service = get_resource_service('wire_search')
+    req = ParsedRequest()
+    req.args = {'source': json.dumps({'query': {'match_all': {}}, 'size': 1})}
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def slow_get(self, req, lookup):
+        calls.append(req)
+        started.set()
+        release.wait(5)
+        return ElasticCursor({'hits': {'total': 1, 'hits': []}}, [{'_id': 'foo'}])
+
+    def search():
+        with app.app_context():
+            results.append(service.internal_get(req, None))
+
+    coalesced = get_search_flight_stats()['coalesced']
+    with mock.patch.object(newsroom.Service, 'get', slow_get):
+        threads = [threading.Thread(target=search) for i in range(3)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        for i in range(50):
+            if get_search_flight_stats()['coalesced'] == coalesced + 2:
+                break
+            time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+    assert 1 == len(calls)
+    assert 3 == len(results)
+    assert all([{'_id': 'foo'}] == cursor.docs for cursor in results)
+    assert results[0].docs is not results[1].docs
+
+    # results are not copied without waiting searches
+    release.set()
+    with mock.patch.object(newsroom.Service, 'get', slow_get), \
+            mock.patch('newsroom.search.deepcopy') as deepcopy_mock:
+        search()
+    assert not deepcopy_mock.called
+    assert 2 == len(calls)
+
+
+def test_search_timings(client, app):
+    from newsroom.search_timings import get_histograms
+
+    resp = client.get('/wire/search', headers={'Accept': 'application/json'})
+    assert 200 == resp.status_code
+    timings = resp.headers.get('Server-Timing')
+    for stage in ['prefill_user', 'prefill_products', 'filters', 'elastic', 'elastic_took', 'post_processing']:
+        assert 'wire-0-{};dur='.format(stage) in timings
+
+    histograms = get_histograms()
+    assert sum(histograms['wire']['total'].values()) >= 1
+    assert sum(histograms['wire']['post_processing'].values()) >= 1
+
+
+def test_items_access_is_checked_using_single_search(client, app):
+    app.data.insert('products', [{
+        '_id': 10,
+        'name': 'matching product',
+        'companies': ['1'],
+        'is_enabled': True,
+        'product_type': 'wire',
+        'query': 'slugline:%s' % items[0]['slugline']
+    }])
+
+    with client.session_transaction() as session:
+        session['user'] = str(PUBLIC_USER_ID)
+        session['user_type'] = 'public'
+
+    service = get_resource_service('wire_search')
+    with mock.patch.object(service, 'get', wraps=service.get) as search:
+        data = get_json(client, '/wire/items/{},{}'.format(items[0]['_id'], items[1]['_id']))
+        assert 1 == search.call_count
+
+    access = {item['_id']: item['_access'] for item in data}
+    assert access == {items[0]['_id']: True, items[1]['_id']: False}
+    assert not [item for item in data if item['_id'] == items[1]['_id']][0].get('body_html')